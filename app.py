@@ -1,24 +1,37 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime, date
 import os
-from io import BytesIO
+import functools
 from data_manager import DataManager
-import gspread
 
-from utils import format_date, validate_quantity
+from utils import format_date, validate_quantity, SIZE_RE, parse_size_columns, read_excel_upload, iter_excel_upload_chunks, normalize_upload_columns, dataframe_to_excel, dataframe_to_csv
+
+# Display formatting is applied by st.dataframe in the browser, so frames are passed through unchanged
+_TRANSACTION_COLUMN_CONFIG = {
+    "quantity": st.column_config.NumberColumn(format="%,.0f"),
+    "date": st.column_config.DateColumn(format="YYYY-MM-DD"),
+}
+# Rows read from an uploaded workbook for the preview and column check
+UPLOAD_PREVIEW_ROWS = 5
+
+_FIT_COLUMN_CONFIG = {
+    "Qty": st.column_config.NumberColumn(format="%,.0f"),
+    "Utilization": st.column_config.NumberColumn(format="%.1f%%"),
+    "Waste Area": st.column_config.NumberColumn(format="%.0f"),
+    "Total Pieces": st.column_config.NumberColumn(format="%,d"),
+}
+
 try:
     from utils import parse_size_string, evaluate_paper_fit_options
 except Exception:
     # Fallback definitions to avoid import errors on some deployments
-    import re
+    @functools.lru_cache(maxsize=256)
     def parse_size_string(size_text):
         if not isinstance(size_text, str):
             return None, None
-        text = size_text.strip().lower()
-        for sep in ['×', '*', 'x', 'X']:
-            text = text.replace(sep, 'x')
-        match = re.search(r"(\d+(?:\.\d+)?)\s*x\s*(\d+(?:\.\d+)?)", text)
+        match = SIZE_RE.search(size_text)
         if not match:
             return None, None
         try:
@@ -26,59 +39,91 @@ except Exception:
         except ValueError:
             return None, None
 
-    def _compute_fit_for_sheet(stock_width, stock_height, req_width, req_height):
-        if min(stock_width, stock_height) <= 0 or min(req_width, req_height) <= 0:
-            return None
-        stock_area = stock_width * stock_height
-        piece_area = req_width * req_height
-        cols_a = int(stock_width // req_width)
-        rows_a = int(stock_height // req_height)
-        count_a = max(0, cols_a * rows_a)
-        waste_a = stock_area - (count_a * piece_area)
-        cols_b = int(stock_width // req_height)
-        rows_b = int(stock_height // req_width)
-        count_b = max(0, cols_b * rows_b)
-        waste_b = stock_area - (count_b * piece_area)
-        candidates = []
-        if count_a > 0:
-            utilization_a = 0.0 if stock_area <= 0 else (count_a * piece_area) / stock_area
-            candidates.append({'best_count': count_a,'best_layout': 'normal','rows': rows_a,'cols': cols_a,'waste_area': max(0.0, waste_a),'utilization': utilization_a})
-        if count_b > 0:
-            utilization_b = 0.0 if stock_area <= 0 else (count_b * piece_area) / stock_area
-            candidates.append({'best_count': count_b,'best_layout': 'rotated','rows': rows_b,'cols': cols_b,'waste_area': max(0.0, waste_b),'utilization': utilization_b})
-        if not candidates:
-            return None
-        candidates.sort(key=lambda c: (-c['best_count'], c['waste_area']))
-        return candidates[0]
+    _FIT_COLUMNS = [
+        'subcategory', 'stock_width', 'stock_height', 'remaining_qty', 'pieces_per_sheet', 'rows', 'cols',
+        'orientation', 'waste_area', 'utilization', 'total_pieces_possible'
+    ]
 
     def evaluate_paper_fit_options(custom_w, custom_h, stock_rows_df):
-        results = []
+        """Return one row per fitting stock sheet, best option first, as a column-built DataFrame."""
+        results = pd.DataFrame(columns=_FIT_COLUMNS)
         if stock_rows_df is None or stock_rows_df.empty:
             return results
-        for _, row in stock_rows_df.iterrows():
-            sub = str(row.get('subcategory', ''))
-            qty = float(row.get('remaining_qty', 0)) if 'remaining_qty' in row else 0.0
-            sw, sh = parse_size_string(sub)
-            if sw is None or sh is None:
-                continue
-            fit = _compute_fit_for_sheet(sw, sh, custom_w, custom_h)
-            if fit is None:
-                continue
-            results.append({
-                'subcategory': sub,
-                'stock_width': sw,
-                'stock_height': sh,
-                'remaining_qty': qty,
-                'pieces_per_sheet': fit['best_count'],
-                'rows': fit['rows'],
-                'cols': fit['cols'],
-                'orientation': fit['best_layout'],
-                'waste_area': fit['waste_area'],
-                'utilization': fit['utilization'],
-                'total_pieces_possible': fit['best_count'] * qty
-            })
-        results.sort(key=lambda r: (-r['pieces_per_sheet'], r['waste_area'], -r['utilization']))
-        return results
+        if min(custom_w, custom_h) <= 0:
+            return results
+
+        # Sizes are parsed once when stock is loaded; parse here only for frames without them
+        subs = stock_rows_df['subcategory'].astype(str)
+        if '_sw' in stock_rows_df.columns and '_sh' in stock_rows_df.columns:
+            sw = stock_rows_df['_sw'].to_numpy(dtype=float)
+            sh = stock_rows_df['_sh'].to_numpy(dtype=float)
+        else:
+            sw, sh = parse_size_columns(subs)
+            sw = sw.to_numpy()
+            sh = sh.to_numpy()
+        if 'remaining_qty' in stock_rows_df.columns:
+            qty = pd.to_numeric(stock_rows_df['remaining_qty'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        else:
+            qty = np.zeros(len(stock_rows_df))
+
+        # Work only on rows with a usable size that could hold at least one piece, so no temporaries
+        # are spent on the rest: the shorter stock side must take the shorter piece side, and the
+        # sheet must have the area of one piece. NaN sizes fail every comparison.
+        parsed = np.flatnonzero(
+            (sw > 0) & (sh > 0)
+            & (np.minimum(sw, sh) >= min(custom_w, custom_h))
+            & (sw * sh >= custom_w * custom_h)
+        )
+        if parsed.size == 0:
+            return results
+        sw = sw[parsed]
+        sh = sh[parsed]
+        qty = qty[parsed]
+        sub_values = subs.to_numpy()[parsed]
+
+        # Normal and rotated layouts for every sheet at once
+        cols_a = (sw // custom_w).astype(int)
+        rows_a = (sh // custom_h).astype(int)
+        count_a = cols_a * rows_a
+        if custom_w == custom_h:
+            # Square pieces pack the same either way round
+            cols_b, rows_b, count_b = cols_a, rows_a, count_a
+        else:
+            cols_b = (sw // custom_h).astype(int)
+            rows_b = (sh // custom_w).astype(int)
+            count_b = cols_b * rows_b
+
+        # Equal counts give equal waste, so the normal layout wins ties
+        rotated = count_b > count_a
+        count = np.where(rotated, count_b, count_a)
+        rows = np.where(rotated, rows_b, rows_a)
+        cols = np.where(rotated, cols_b, cols_a)
+
+        stock_area = sw * sh
+        used_area = count * (custom_w * custom_h)
+        waste = np.maximum(0.0, stock_area - used_area)
+        utilization = used_area / stock_area
+
+        keep = np.flatnonzero(count > 0)
+        if keep.size == 0:
+            return results
+        # Primary key last: most pieces, then least waste, then best utilization
+        order = keep[np.lexsort((-utilization[keep], waste[keep], -count[keep]))]
+
+        return pd.DataFrame({
+            'subcategory': sub_values[order],
+            'stock_width': sw[order],
+            'stock_height': sh[order],
+            'remaining_qty': qty[order],
+            'pieces_per_sheet': count[order],
+            'rows': rows[order],
+            'cols': cols[order],
+            'orientation': np.where(rotated[order], 'rotated', 'normal'),
+            'waste_area': waste[order],
+            'utilization': utilization[order],
+            'total_pieces_possible': count[order] * qty[order]
+        })
+
 from auth import AuthManager
 
 st.set_page_config(
@@ -96,63 +141,174 @@ if 'auth_manager' not in st.session_state:
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
 
-def check_sheets_status():
-    """Display Google Sheets configuration status."""
-    import os
+def _fit_results_table(results):
+    """Shape evaluate_paper_fit_options output for display; numbers stay numeric for _FIT_COLUMN_CONFIG."""
+    return pd.DataFrame({
+        "Stock Size": results['stock_width'].astype(int).astype(str) + "x" + results['stock_height'].astype(int).astype(str),
+        "Subcategory": results['subcategory'],
+        "Qty": results['remaining_qty'],
+        "Pieces/Sheet": results['pieces_per_sheet'],
+        "Layout": results['orientation'],
+        "RowsxCols": results['rows'].astype(str) + "x" + results['cols'].astype(str),
+        "Utilization": results['utilization'] * 100,
+        "Waste Area": results['waste_area'],
+        "Total Pieces": results['total_pieces_possible'].astype(int)
+    })
+
+@st.cache_data(show_spinner=False, ttl=300)
+def _cached_current_stock(category, version):
+    """Current stock for a category, reused across reruns until the data version changes."""
+    return st.session_state.data_manager.get_current_stock(category)
+
+@st.cache_data(show_spinner=False, ttl=300)
+def _cached_fit_options(req_width, req_height, version):
+    """Fit options for a required size against current Paper stock, reused until the data version changes."""
+    return evaluate_paper_fit_options(req_width, req_height, _cached_current_stock("Paper", version))
+
+@st.cache_data(show_spinner=False, ttl=300)
+def _cached_all_current_stock(version):
+    """Current stock for all categories, reused across reruns until the data version changes."""
+    return st.session_state.data_manager.get_all_current_stock()
+
+# Text columns of the transactions frame
+_TRANSACTION_TEXT_COLUMNS = ('category', 'subcategory', 'transaction_type', 'supplier', 'notes')
+
+@st.cache_data(show_spinner=False, ttl=300)
+def _cached_all_transactions(version):
+    """All transactions, reused across reruns until the data version changes.
+    Text columns are held as Arrow strings; pandas 3 already reads them that way."""
+    transactions = st.session_state.data_manager.get_all_transactions()
+    object_columns = [col for col in _TRANSACTION_TEXT_COLUMNS if col in transactions.columns and transactions[col].dtype == object]
+    if object_columns:
+        transactions = transactions.astype({col: 'string[pyarrow]' for col in object_columns})
+    return transactions
+
+@st.cache_data(show_spinner=False, ttl=300)
+def _cached_transactions_by_date(version):
+    """All transactions sorted by date (undated rows last), keeping their original index.
+    The report filter columns are categoricals so equality checks compare integer codes."""
+    transactions = _cached_all_transactions(version)
+    if transactions.empty:
+        return transactions
+    transactions = transactions.sort_values('date', kind='stable')
+    return transactions.astype({'category': 'category', 'transaction_type': 'category', 'subcategory': 'category'})
+
+@st.cache_data(show_spinner=False, ttl=300)
+def _cached_recent_transactions(limit, version):
+    """Most recent transactions, reused across reruns until the data version changes."""
+    return st.session_state.data_manager.get_recent_transactions(limit)
+
+@st.cache_data(show_spinner=False, ttl=300)
+def _cached_transaction_history(category, subcategory, version):
+    """Transaction history for a category/subcategory, reused until the data version changes."""
+    return st.session_state.data_manager.get_transaction_history(category, subcategory=subcategory)
+
+@st.cache_data(show_spinner=False, ttl=300)
+def _cached_category_bundle(category, version):
+    """Templates, subcategories, recent history and stock for a category page, reused until the data version changes."""
+    return st.session_state.data_manager.get_category_bundle(category)
+
+# Fields matched by the sidebar search and by the report text filter
+_SEARCH_FIELDS = ('category', 'subcategory', 'notes', 'supplier', 'transaction_type')
+_REPORT_SEARCH_FIELDS = ('subcategory', 'notes', 'supplier')
+
+@st.cache_data(show_spinner=False, ttl=300)
+def _cached_transaction_search_text(version, fields=_SEARCH_FIELDS):
+    """Lowercased searchable text per transaction, fields joined by a unit separator."""
+    transactions = _cached_all_transactions(version)
+    text = transactions[fields[0]].astype('string').fillna('')
+    for field in fields[1:]:
+        text = text + '\x1f' + transactions[field].astype('string').fillna('')
+    return text.str.lower()
+
+def _file_mtime(path):
+    """Modification time of a file, or 0 if it does not exist."""
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
+
+@st.cache_data(show_spinner=False)
+def _config_file_sheets_id(config_file, config_mtime):
+    """GOOGLE_SHEETS_ID from data/config.txt, parsed once per file version; config_mtime invalidates the cache.
+    Read errors propagate, so they are not cached."""
+    with open(config_file, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('GOOGLE_SHEETS_ID='):
+                return line.split('=', 1)[1].strip().strip('"').strip("'")
+    return None
+
+def _read_sheets_config(credentials_path, config_file):
+    """Probe credentials and spreadsheet ID sources. The environment and secrets are checked on every
+    call so changes to them show up; only the config.txt parse is cached."""
+    credentials_exists = os.path.exists(credentials_path)
+
+    # Check spreadsheet ID (try all sources)
+    spreadsheet_id = None
+    source = "Not found"
+
+    # Try environment variable
+    spreadsheet_id = os.getenv("GOOGLE_SHEETS_ID")
+    if spreadsheet_id:
+        source = "Environment Variable"
+    else:
+        # Try Streamlit secrets
+        try:
+            if hasattr(st, 'secrets') and 'GOOGLE_SHEETS_ID' in st.secrets:
+                spreadsheet_id = st.secrets['GOOGLE_SHEETS_ID']
+                source = "Streamlit Secrets"
+        except Exception:
+            pass
+
+    # Try config file
+    config_mtime = _file_mtime(config_file)
+    if not spreadsheet_id and config_mtime:
+        try:
+            spreadsheet_id = _config_file_sheets_id(config_file, config_mtime)
+            if spreadsheet_id:
+                source = "Config File"
+        except OSError:
+            pass
+
+    return credentials_exists, spreadsheet_id, source
+
+@functools.cache
+def _sheets_manager_class():
+    """Import SheetsManager on first use and reuse it on later reruns."""
     from sheets_manager import SheetsManager
+    return SheetsManager
 
+def _service_account_details():
+    """Service account email and credentials source of the shared SheetsManager.
+    Not cached: both are attributes of the manager, and a cached miss would outlive newly added credentials."""
+    from sheets_manager import get_sheets_manager
+    _sm = get_sheets_manager()
+    return _sm.get_service_account_email(), _sm.get_credentials_source()
 
+def check_sheets_status():
+    """Display Google Sheets configuration status."""
     st.subheader("Google Sheets Connection Status")
     
     # Check credentials file
     base_dir = os.path.dirname(os.path.abspath(__file__))
     credentials_path = os.path.join(base_dir, "data", "credentials.json")
+    config_file = os.path.join(base_dir, "data", "config.txt")
+    credentials_exists, spreadsheet_id, source = _read_sheets_config(credentials_path, config_file)
     
     col1, col2 = st.columns([1, 3])
     with col1:
-        if os.path.exists(credentials_path):
+        if credentials_exists:
             st.success("✓")
         else:
             st.error("✗")
     with col2:
-        if os.path.exists(credentials_path):
+        if credentials_exists:
             st.write("**Credentials file found**")
         else:
             st.write("**Credentials file missing**")
             st.caption(f"Expected at: {credentials_path}")
     
-    # Check spreadsheet ID (try all sources)
-    spreadsheet_id = None
-    source = "Not found"
-    
-    # Try environment variable
-    spreadsheet_id = os.getenv("GOOGLE_SHEETS_ID")
-    if spreadsheet_id:
-        source = "Environment Variable"
-    else:
-        # Try Streamlit secrets
-        try:
-            if hasattr(st, 'secrets') and 'GOOGLE_SHEETS_ID' in st.secrets:
-                spreadsheet_id = st.secrets['GOOGLE_SHEETS_ID']
-                source = "Streamlit Secrets"
-        except:
-            pass
-    
-    # Try config file
-    if not spreadsheet_id:
-        config_file = os.path.join(base_dir, "data", "config.txt")
-        if os.path.exists(config_file):
-            try:
-                with open(config_file, 'r') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line.startswith('GOOGLE_SHEETS_ID='):
-                            spreadsheet_id = line.split('=', 1)[1].strip().strip('"').strip("'")
-                            source = "Config File"
-                            break
-            except:
-                pass
-    
     col1, col2 = st.columns([1, 3])
     with col1:
         if spreadsheet_id:
@@ -254,10 +410,7 @@ def check_sheets_status():
 
     # Show detected service account email (helps sharing)
     try:
-        from sheets_manager import SheetsManager
-        _sm = SheetsManager()
-        email = _sm.get_service_account_email()
-        src = _sm.get_credentials_source()
+        email, src = _service_account_details()
         if email:
             st.caption(f"Service account email (share your sheet with this): {email}")
         if src:
@@ -274,7 +427,7 @@ def check_sheets_status():
     if st.button("🔌 Test Connection", width='stretch'):
         with st.spinner("Testing Google Sheets connection..."):
             try:
-                sheets_manager = SheetsManager()
+                sheets_manager = _sheets_manager_class()()
                 if sheets_manager.is_configured():
                     st.success("✅ **Connection successful!**")
                     st.write(f"**Spreadsheet:** {sheets_manager.spreadsheet.title}")
@@ -325,7 +478,7 @@ def check_sheets_status():
                     if not spreadsheet_id:
                         st.error("Spreadsheet ID not configured!")
                     # Show file path only as a fallback option
-                    if not os.path.exists(credentials_path):
+                    if not credentials_exists:
                         st.caption(f"No local credentials file at: {credentials_path}")
             except Exception as e:
                 st.error(f"❌ **Error:** {str(e)}")
@@ -357,21 +510,19 @@ def main():
 
         # Global search
         st.subheader("🔍 Global Search")
-        search_query = st.text_input("Search all transactions", placeholder="Search by product, supplier, notes...")
+        # Inside a form the query only reaches the script on submit, not on every keystroke
+        with st.form("search_form", clear_on_submit=False):
+            search_query = st.text_input("Search all transactions", placeholder="Search by product, supplier, notes...")
+            st.form_submit_button("Search", width='stretch')
 
         if search_query:
-            all_transactions = st.session_state.data_manager.get_all_transactions()
+            data_version = st.session_state.data_manager.data_version
+            all_transactions = _cached_all_transactions(data_version)
 
             if not all_transactions.empty:
-                # Search across multiple fields
-                search_lower = search_query.lower()
-                mask = (
-                    all_transactions['category'].astype(str).str.lower().str.contains(search_lower, na=False) |
-                    all_transactions['subcategory'].astype(str).str.lower().str.contains(search_lower, na=False) |
-                    all_transactions['notes'].astype(str).str.lower().str.contains(search_lower, na=False) |
-                    all_transactions['supplier'].astype(str).str.lower().str.contains(search_lower, na=False) |
-                    all_transactions['transaction_type'].astype(str).str.lower().str.contains(search_lower, na=False)
-                )
+                # Search across multiple fields with a single pass over the combined text
+                search_text = _cached_transaction_search_text(data_version)
+                mask = search_text.str.contains(search_query.lower(), regex=False, na=False)
                 results = all_transactions[mask]
 
                 if not results.empty:
@@ -379,22 +530,13 @@ def main():
 
                     # Display results in expandable section
                     with st.expander(f"View {len(results)} Results", expanded=True):
-                        display_results = results.copy()
-                        display_results['quantity'] = (
-                            pd.to_numeric(display_results['quantity'], errors='coerce')
-                            .fillna(0)
-                            .apply(lambda x: f"{x:,.0f}")
-                        )
-                        try:
-                            display_results['date'] = pd.to_datetime(display_results['date'], errors='coerce').dt.strftime('%Y-%m-%d')
-                            display_results = display_results.sort_values('date', ascending=False)
-                        except (KeyError, AttributeError):
-                            pass
+                        display_results = results.sort_values('date', ascending=False)
 
                         st.dataframe(
                             display_results[['date', 'category', 'subcategory', 'transaction_type', 'quantity', 'supplier', 'notes']],
                             width='stretch',
-                            hide_index=True
+                            hide_index=True,
+                            column_config=_TRANSACTION_COLUMN_CONFIG
                         )
                 else:
                     st.info("No results found")
@@ -450,13 +592,22 @@ def show_dashboard():
     # Get current stock levels for all categories
     categories = ["Paper", "Inks", "Chemicals", "Poly Films"]
 
+    # One read for all categories; per-category figures come from groupby
+    all_stock = _cached_all_current_stock(st.session_state.data_manager.data_version)
+    if not all_stock.empty:
+        stock_by_category = all_stock.groupby('category')['remaining_qty']
+        item_counts = stock_by_category.size()
+        qty_totals = stock_by_category.sum()
+    else:
+        item_counts = pd.Series(dtype=int)
+        qty_totals = pd.Series(dtype=float)
+
     # Create columns for dashboard metrics
     col1, col2, col3, col4 = st.columns(4)
 
     for i, category in enumerate(categories):
-        current_stock = st.session_state.data_manager.get_current_stock(category)
-        total_items = len(current_stock)
-        total_qty = current_stock['remaining_qty'].sum() if not current_stock.empty else 0
+        total_items = int(item_counts.get(category, 0))
+        total_qty = qty_totals.get(category, 0)
 
         with [col1, col2, col3, col4][i]:
             st.metric(
@@ -469,23 +620,14 @@ def show_dashboard():
 
     # Show recent transactions
     st.subheader("Recent Transactions (Last 10)")
-    recent_transactions = st.session_state.data_manager.get_recent_transactions(10)
+    recent_transactions = _cached_recent_transactions(10, st.session_state.data_manager.data_version)
 
     if not recent_transactions.empty:
-        # Format the dataframe for display
-        display_df = recent_transactions.copy()
-        display_df['quantity'] = (
-            pd.to_numeric(display_df['quantity'], errors='coerce')
-            .fillna(0)
-            .apply(lambda x: f"{x:,.0f}")
-        )
-        if 'date' in display_df.columns:
-            display_df['date'] = pd.to_datetime(display_df['date'], errors='coerce').dt.strftime('%Y-%m-%d')
-
         st.dataframe(
-            display_df,
+            recent_transactions,
             width='stretch',
-            hide_index=True
+            hide_index=True,
+            column_config=_TRANSACTION_COLUMN_CONFIG
         )
     else:
         st.info("No transactions recorded yet.")
@@ -494,18 +636,32 @@ def show_dashboard():
     st.subheader("Stock Alerts")
     low_stock_threshold = st.number_input("Low Stock Alert Threshold", min_value=0, value=10, step=1)
 
-    for category in categories:
-        current_stock = st.session_state.data_manager.get_current_stock(category)
-        if not current_stock.empty:
-            low_stock = current_stock[current_stock['remaining_qty'] <= low_stock_threshold]
-            if not low_stock.empty:
-                st.warning(f"⚠️ Low stock in {category}: {len(low_stock)} items below threshold")
-                with st.expander(f"View {category} low stock items"):
-                    st.dataframe(low_stock, width='stretch', hide_index=True)
+    if not all_stock.empty:
+        low_stock = all_stock[all_stock['remaining_qty'] <= low_stock_threshold]
+    else:
+        low_stock = all_stock
+
+    if not low_stock.empty:
+        low_counts = low_stock.groupby('category').size()
+        for category in categories:
+            count = int(low_counts.get(category, 0))
+            if count:
+                st.warning(f"⚠️ Low stock in {category}: {count} items below threshold")
+        with st.expander("View low stock items"):
+            st.dataframe(
+                low_stock.sort_values(['category', 'remaining_qty']),
+                width='stretch',
+                hide_index=True
+            )
 
 def show_category_page(category, include_supplier=False):
     st.header(f"{category} Stock Management")
 
+    # One cached read serves every per-category lookup on this page
+    templates, existing_subcategories, recent_history, current_stock = _cached_category_bundle(
+        category, st.session_state.data_manager.data_version
+    )
+
     # Create two columns: one for adding stock, one for current stock
     col1, col2 = st.columns([1, 2])
 
@@ -513,8 +669,6 @@ def show_category_page(category, include_supplier=False):
         st.subheader("Add Stock Transaction")
 
         # Template quick load section
-        templates = st.session_state.data_manager.get_templates(category)
-
         if not templates.empty:
             st.markdown("**⚡ Quick Load Template**")
             template_names = templates['template_name'].tolist()
@@ -540,9 +694,6 @@ def show_category_page(category, include_supplier=False):
 
             st.markdown("---")
 
-        # Get existing subcategories for this category
-        existing_subcategories = st.session_state.data_manager.get_subcategories(category)
-
         # Check if template data exists
         default_subcategory = st.session_state.get(f'template_subcategory_{category}', "")
 
@@ -613,49 +764,24 @@ def show_category_page(category, include_supplier=False):
                     )
 
                 if query_size_text:
+                    df_now = None
                     rw_now, rh_now = parse_size_string(query_size_text)
-                    if rw_now is None or rh_now is None or rw_now <= 0 or rh_now <= 0:
+                    if rw_now is not None and rh_now is not None and rw_now > 0 and rh_now > 0:
+                        # Cached per size and data version; min_pieces is applied after the cache
+                        results_now = _cached_fit_options(rw_now, rh_now, st.session_state.data_manager.data_version)
+                        if min_pieces_now > 0:
+                            results_now = results_now[results_now['pieces_per_sheet'] >= min_pieces_now]
+                        df_now = _fit_results_table(results_now)
+
+                    if df_now is None:
                         st.error("Could not parse size. Use format like '15x20'.")
+                    elif not df_now.empty:
+                        try:
+                            st.dataframe(df_now, width='stretch', hide_index=True, column_config=_FIT_COLUMN_CONFIG)
+                        except Exception:
+                            st.json(df_now.to_dict(orient='records'))
                     else:
-                        paper_stock_now = st.session_state.data_manager.get_current_stock("Paper")
-                        results_now = evaluate_paper_fit_options(rw_now, rh_now, paper_stock_now)
-                        if min_pieces_now > 0:
-                            results_now = [r for r in results_now if r['pieces_per_sheet'] >= min_pieces_now]
-
-                        if results_now:
-                            try:
-                                df_now = pd.DataFrame([
-                                    {
-                                        "Stock Size": f"{int(r['stock_width'])}x{int(r['stock_height'])}",
-                                        "Subcategory": r['subcategory'],
-                                        "Qty": r['remaining_qty'],
-                                        "Pieces/Sheet": r['pieces_per_sheet'],
-                                        "Layout": r['orientation'],
-                                        "RowsxCols": f"{r['rows']}x{r['cols']}",
-                                        "Utilization": f"{r['utilization']*100:.1f}%",
-                                        "Waste Area": f"{r['waste_area']:.0f}",
-                                        "Total Pieces": int(r['total_pieces_possible'])
-                                    }
-                                    for r in results_now
-                                ])
-                                st.dataframe(df_now, width='stretch', hide_index=True)
-                            except Exception:
-                                st.json([
-                                    {
-                                        "Stock Size": f"{int(r['stock_width'])}x{int(r['stock_height'])}",
-                                        "Subcategory": r['subcategory'],
-                                        "Qty": r['remaining_qty'],
-                                        "Pieces/Sheet": r['pieces_per_sheet'],
-                                        "Layout": r['orientation'],
-                                        "RowsxCols": f"{r['rows']}x{r['cols']}",
-                                        "Utilization": f"{r['utilization']*100:.1f}%",
-                                        "Waste Area": f"{r['waste_area']:.0f}",
-                                        "Total Pieces": int(r['total_pieces_possible'])
-                                    }
-                                    for r in results_now
-                                ])
-                        else:
-                            st.info("No fitting options found for this size in current Paper stock.")
+                        st.info("No fitting options found for this size in current Paper stock.")
 
         # (Inline best-fit helper removed to avoid indentation issues in some deployments)
 
@@ -682,8 +808,9 @@ def show_category_page(category, include_supplier=False):
 
         st.markdown("---")
         with st.expander("Debug: Latest transactions for this category"):
-            _hist = st.session_state.data_manager.get_transaction_history(category, limit=5)
-            st.dataframe(_hist, width='stretch', hide_index=True)
+            # Expanders render their body even when collapsed, so serialize the table only on request
+            if st.checkbox("Show latest transactions", value=False, key=f"dbg_tx_{category}"):
+                st.dataframe(recent_history, width='stretch', hide_index=True, column_config=_TRANSACTION_COLUMN_CONFIG)
         # Excel upload section
         st.subheader("📊 Bulk Upload")
         uploaded_file = st.file_uploader(
@@ -695,8 +822,10 @@ def show_category_page(category, include_supplier=False):
 
         if uploaded_file is not None:
             try:
-                # Read Excel file (using openpyxl engine for .xlsx files)
-                df = pd.read_excel(uploaded_file, engine='openpyxl')
+                # Read only the preview rows here; the full sheet is streamed in chunks on upload
+                df = read_excel_upload(uploaded_file, nrows=UPLOAD_PREVIEW_ROWS)
+                # Normalize headers and common aliases (e.g. "Qty") so the column check matches bulk_upload
+                df.columns = normalize_upload_columns(df.columns)
                 
                 st.write("**Preview of uploaded data:**")
                 st.dataframe(df.head(), width='stretch')
@@ -709,8 +838,7 @@ def show_category_page(category, include_supplier=False):
                 if include_supplier:
                     required_cols.append('supplier')
                 
-                detected_lower = [col.lower().strip() for col in df.columns]
-                missing = [col for col in required_cols if col.lower() not in detected_lower]
+                missing = [col for col in required_cols if col not in df.columns]
                 
                 if missing:
                     st.warning(
@@ -721,7 +849,10 @@ def show_category_page(category, include_supplier=False):
                     )
 
                 if st.button("Process Upload", key=f"process_upload_{category}"):
-                    success_count = st.session_state.data_manager.bulk_upload(category, df, include_supplier)
+                    uploaded_file.seek(0)
+                    success_count = st.session_state.data_manager.bulk_upload(
+                        category, iter_excel_upload_chunks(uploaded_file), include_supplier
+                    )
                     if success_count > 0:
                         st.success(f"Successfully uploaded {success_count} transactions!")
                         st.rerun()
@@ -815,28 +946,22 @@ def show_category_page(category, include_supplier=False):
     with col2:
         st.subheader(f"Current {category} Stock")
 
-        # Get and display current stock
-        current_stock = st.session_state.data_manager.get_current_stock(category)
-
+        # Display current stock
         if not current_stock.empty:
             # Format quantities for display
             with st.expander("Debug: Raw stock rows for this category"):
-                st.dataframe(current_stock, width='stretch', hide_index=True)
-            display_stock = current_stock.copy()
-            display_stock['remaining_qty'] = (
-                pd.to_numeric(display_stock['remaining_qty'], errors='coerce')
-                .fillna(0)
-                .apply(lambda x: f"{x:,.0f}")
-            )
-
+                if st.checkbox("Show raw rows", value=False, key=f"dbg_stock_{category}"):
+                    st.dataframe(current_stock, width='stretch', hide_index=True)
             column_config = {
                 "subcategory": "Subcategory",
-                "remaining_qty": "Remaining Quantity",
+                "remaining_qty": st.column_config.NumberColumn("Remaining Quantity", format="%,.0f"),
+                # Parsed sheet sizes are kept for the cut optimizer, not for display
+                "_sw": None,
+                "_sh": None,
             }
             if include_supplier:
                 column_config["supplier"] = "Latest Supplier"
             with st.expander("Delete Subcategory", expanded=False):
-                existing_subcategories = st.session_state.data_manager.get_subcategories(category)
                 del_sub = st.selectbox(
                     "Select subcategory to delete",
                     options=["-- Select --"] + existing_subcategories,
@@ -863,7 +988,7 @@ def show_category_page(category, include_supplier=False):
                     else:
                         st.error("Please select a subcategory to delete.")
             st.dataframe(
-                display_stock,
+                current_stock,
                 width='stretch',
                 hide_index=True,
                 column_config=column_config
@@ -890,48 +1015,39 @@ def show_category_page(category, include_supplier=False):
                         if rw is None or rh is None or rw <= 0 or rh <= 0:
                             st.error("Could not parse custom size. Use format like '15x20'.")
                         else:
-                            paper_stock = st.session_state.data_manager.get_current_stock("Paper")
-                            results = evaluate_paper_fit_options(rw, rh, paper_stock)
+                            # min_pieces is applied after the cache so changing it reuses the computed options
+                            results = _cached_fit_options(rw, rh, st.session_state.data_manager.data_version)
                             if min_pieces > 0:
-                                results = [r for r in results if r['pieces_per_sheet'] >= min_pieces]
+                                results = results[results['pieces_per_sheet'] >= min_pieces]
 
-                            if results:
+                            if not results.empty:
                                 # Show a compact table
-                                df = pd.DataFrame([
-                                    {
-                                        "Stock Size": f"{int(r['stock_width'])}x{int(r['stock_height'])}",
-                                        "Subcategory": r['subcategory'],
-                                        "Qty": r['remaining_qty'],
-                                        "Pieces/Sheet": r['pieces_per_sheet'],
-                                        "Layout": r['orientation'],
-                                        "RowsxCols": f"{r['rows']}x{r['cols']}",
-                                        "Utilization": f"{r['utilization']*100:.1f}%",
-                                        "Waste Area": f"{r['waste_area']:.0f}",
-                                        "Total Pieces": int(r['total_pieces_possible'])
-                                    }
-                                    for r in results
-                                ])
-                                st.dataframe(df, width='stretch', hide_index=True)
+                                st.dataframe(
+                                    _fit_results_table(results),
+                                    width='stretch',
+                                    hide_index=True,
+                                    column_config=_FIT_COLUMN_CONFIG
+                                )
                             else:
                                 st.info("No fitting options found for this size in current Paper stock.")
             with st.expander("Quick Delete Subcategory (exact match)", expanded=False):
-                if not current_stock.empty:
-                    for idx, row in current_stock.iterrows():
-                        c1, c2, c3 = st.columns([3, 2, 1])
-                        with c1:
-                            st.write(f"{row['subcategory']}")
-                        with c2:
-                            st.write(f"Qty: {row['remaining_qty']}")
-                        with c3:
-                            if st.button("Delete", key=f"row_del_{category}_{row['subcategory']}"):
-                                ok, removed_stock, removed_txs = st.session_state.data_manager.delete_subcategory(
-                                    category=category,
-                                    subcategory=str(row['subcategory']),
-                                    delete_transactions=True
-                                )
-                                if ok:
-                                    st.success(f"Deleted '{row['subcategory']}' from {category} (stock rows removed: {removed_stock}, transactions: {removed_txs})")
-                                    st.rerun()
+                with st.form(f"quick_delete_{category}"):
+                    picks = st.multiselect(
+                        "Subcategories to delete (with their transactions)",
+                        options=current_stock['subcategory'].astype(str).tolist()
+                    )
+                    if st.form_submit_button("Delete selected"):
+                        if picks:
+                            ok, removed_stock, removed_txs = st.session_state.data_manager.delete_subcategory(
+                                category=category,
+                                subcategory=picks,
+                                delete_transactions=True
+                            )
+                            if ok:
+                                st.success(f"Deleted {', '.join(picks)} from {category} (stock rows removed: {removed_stock}, transactions: {removed_txs})")
+                                st.rerun()
+                        else:
+                            st.error("Please select at least one subcategory to delete.")
             
             # Show transaction history for selected subcategory
             if len(current_stock) > 0:
@@ -943,25 +1059,18 @@ def show_category_page(category, include_supplier=False):
                     options=["All"] + list(current_stock['subcategory'].unique())
                 )
 
-                history = st.session_state.data_manager.get_transaction_history(
-                    category, 
-                    subcategory=None if selected_subcategory == "All" else selected_subcategory
+                history = _cached_transaction_history(
+                    category,
+                    None if selected_subcategory == "All" else selected_subcategory,
+                    st.session_state.data_manager.data_version
                 )
 
                 if not history.empty:
-                    # Format history for display
-                    display_history = history.copy()
-                    display_history['quantity'] = pd.to_numeric(display_history['quantity'], errors='coerce')
-                    display_history['quantity'] = display_history['quantity'].apply(
-                        lambda x: f"{x:,.0f}" if pd.notna(x) else ""
-                    )
-                    if 'date' in display_history.columns:
-                        display_history['date'] = pd.to_datetime(display_history['date'], errors='coerce').dt.strftime('%Y-%m-%d')
-
                     st.dataframe(
-                        display_history,
+                        history,
                         width='stretch',
-                        hide_index=True
+                        hide_index=True,
+                        column_config=_TRANSACTION_COLUMN_CONFIG
                     )
                 else:
                     st.info(f"No transaction history found for {selected_subcategory}.")
@@ -970,6 +1079,7 @@ def show_category_page(category, include_supplier=False):
 
 def show_reports():
     st.header("📈 Reports & Analytics")
+    data_version = st.session_state.data_manager.data_version
 
     # Filters section
     st.subheader("Filters")
@@ -993,7 +1103,7 @@ def show_reports():
 
     with col3:
         # Get all subcategories for search
-        all_transactions = st.session_state.data_manager.get_all_transactions()
+        all_transactions = _cached_all_transactions(data_version)
         if not all_transactions.empty:
             all_subcategories = ["All"] + sorted(all_transactions['subcategory'].unique().tolist())
         else:
@@ -1004,37 +1114,32 @@ def show_reports():
     search_text = st.text_input("🔍 Search in notes, supplier, or subcategory", placeholder="Enter search term...")
 
     if st.button("Generate Report", type="primary"):
-        # Get filtered transactions
-        all_transactions = st.session_state.data_manager.get_all_transactions()
+        # Get filtered transactions (dates are parsed at load time and kept sorted)
+        all_transactions = _cached_transactions_by_date(data_version)
 
         if not all_transactions.empty:
-            # Filter by date range
-            all_transactions['date'] = pd.to_datetime(all_transactions['date'], errors='coerce')
-            filtered_df = all_transactions[
-                (all_transactions['date'] >= pd.to_datetime(start_date)) &
-                (all_transactions['date'] <= pd.to_datetime(end_date))
-            ]
-
-            # Filter by category
-            if selected_category != "All":
-                filtered_df = filtered_df[filtered_df['category'] == selected_category]
+            # Filter by date range with a binary search over the sorted dates
+            lo, hi = all_transactions['date'].to_numpy().searchsorted(
+                [np.datetime64(start_date), np.datetime64(end_date) + np.timedelta64(1, 'D')]
+            )
+            filtered_df = all_transactions.iloc[lo:hi]
 
-            # Filter by transaction type
+            # Filter by category, transaction type and subcategory in one selection
+            mask = np.ones(len(filtered_df), dtype=bool)
+            if selected_category != "All":
+                mask &= (filtered_df['category'] == selected_category).to_numpy()
             if selected_transaction_type != "All":
-                filtered_df = filtered_df[filtered_df['transaction_type'] == selected_transaction_type]
-
-            # Filter by subcategory
+                mask &= (filtered_df['transaction_type'] == selected_transaction_type).to_numpy()
             if selected_subcategory != "All":
-                filtered_df = filtered_df[filtered_df['subcategory'] == selected_subcategory]
+                mask &= (filtered_df['subcategory'] == selected_subcategory).to_numpy()
+            if not mask.all():
+                filtered_df = filtered_df[mask]
 
             # Text search filter
             if search_text:
-                search_lower = search_text.lower()
-                mask = (
-                    filtered_df['subcategory'].astype(str).str.lower().str.contains(search_lower, na=False) |
-                    filtered_df['notes'].astype(str).str.lower().str.contains(search_lower, na=False) |
-                    filtered_df['supplier'].astype(str).str.lower().str.contains(search_lower, na=False)
-                )
+                # One substring pass over the cached combined text, aligned on the filtered rows
+                search_blob = _cached_transaction_search_text(data_version, _REPORT_SEARCH_FIELDS)
+                mask = search_blob.loc[filtered_df.index].str.contains(search_text.lower(), regex=False, na=False)
                 filtered_df = filtered_df[mask]
 
             if not filtered_df.empty:
@@ -1042,17 +1147,18 @@ def show_reports():
 
                 # Summary metrics
                 col1, col2, col3, col4 = st.columns(4)
+                type_totals = filtered_df.groupby('transaction_type', observed=True)['quantity'].sum()
 
                 with col1:
                     total_transactions = len(filtered_df)
                     st.metric("Total Transactions", total_transactions)
 
                 with col2:
-                    stock_in_qty = filtered_df[filtered_df['transaction_type'] == 'Stock In']['quantity'].sum()
+                    stock_in_qty = type_totals.get('Stock In', 0)
                     st.metric("Total Stock In", f"{stock_in_qty:,.0f}")
 
                 with col3:
-                    stock_out_qty = filtered_df[filtered_df['transaction_type'] == 'Stock Out']['quantity'].sum()
+                    stock_out_qty = type_totals.get('Stock Out', 0)
                     st.metric("Total Stock Out", f"{stock_out_qty:,.0f}")
 
                 with col4:
@@ -1069,13 +1175,12 @@ def show_reports():
 
                 with chart_col1:
                     st.markdown("**Stock Movement Over Time**")
-                    # Prepare data for time series chart
-                    time_series_data = filtered_df.copy()
-                    time_series_data['date'] = pd.to_datetime(time_series_data['date'], errors='coerce')
-                    time_series_data = time_series_data.sort_values('date')
-
-                    # Group by date and transaction type
-                    daily_summary = time_series_data.groupby([time_series_data['date'].dt.date, 'transaction_type'])['quantity'].sum().reset_index()
+                    # Group by day and transaction type (rows are already in date order)
+                    daily_summary = (
+                        filtered_df.assign(day=filtered_df['date'].to_numpy().astype('datetime64[D]'))
+                        .groupby(['day', 'transaction_type'], observed=True, sort=False, as_index=False)['quantity']
+                        .sum()
+                    )
                     daily_summary.columns = ['Date', 'Type', 'Quantity']
 
                     # Pivot for chart
@@ -1088,7 +1193,7 @@ def show_reports():
 
                 with chart_col2:
                     st.markdown("**Transactions by Category**")
-                    category_summary = filtered_df.groupby('category')['quantity'].sum().reset_index()
+                    category_summary = filtered_df.groupby('category', observed=True, sort=False, as_index=False)['quantity'].sum()
                     category_summary.columns = ['Category', 'Total Quantity']
 
                     if not category_summary.empty:
@@ -1098,7 +1203,7 @@ def show_reports():
 
                 # Stock In vs Stock Out comparison
                 st.markdown("**Stock In vs Stock Out by Category**")
-                category_type_summary = filtered_df.groupby(['category', 'transaction_type'])['quantity'].sum().reset_index()
+                category_type_summary = filtered_df.groupby(['category', 'transaction_type'], observed=True, sort=False, as_index=False)['quantity'].sum()
                 category_type_pivot = category_type_summary.pivot(index='category', columns='transaction_type', values='quantity').fillna(0)
 
                 if not category_type_pivot.empty:
@@ -1110,26 +1215,18 @@ def show_reports():
 
                 # Detailed transaction table
                 st.subheader("Detailed Transactions")
-                display_df = filtered_df.copy()
-                display_df['quantity'] = (
-                    pd.to_numeric(display_df['quantity'], errors='coerce')
-                    .fillna(0)
-                    .apply(lambda x: f"{x:,.0f}")
-                )
-                display_df['date'] = display_df['date'].dt.strftime('%Y-%m-%d')
-                display_df = display_df.sort_values('date', ascending=False)
-
                 st.dataframe(
-                    display_df,
+                    filtered_df.iloc[::-1],
                     width='stretch',
-                    hide_index=True
+                    hide_index=True,
+                    column_config=_TRANSACTION_COLUMN_CONFIG
                 )
 
                 # Download report as CSV and Excel
                 col1, col2 = st.columns(2)
 
                 with col1:
-                    csv = filtered_df.to_csv(index=False)
+                    csv = dataframe_to_csv(filtered_df)
                     st.download_button(
                         label="📥 Download Report as CSV",
                         data=csv,
@@ -1140,10 +1237,7 @@ def show_reports():
 
                 with col2:
                     # Create Excel file
-                    buffer = BytesIO()
-                    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                        filtered_df.to_excel(writer, index=False, sheet_name='Transactions')
-                    buffer.seek(0)
+                    buffer = dataframe_to_excel(filtered_df, sheet_name='Transactions')
 
                     st.download_button(
                         label="📊 Download Report as Excel",
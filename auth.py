@@ -1,13 +1,23 @@
 import streamlit as st
 import hashlib
+import hmac
 import os
 
+# scrypt cost parameters; 128 * r * n bytes (32 MiB) of memory per hash
+SCRYPT_N = 2 ** 15
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_PREFIX = "$scrypt$"
+
 class AuthManager:
     def __init__(self):
         # Anchor password file to project folder to avoid per-CWD duplicates
         base_dir = os.path.dirname(os.path.abspath(__file__))
         self.password_file = os.path.join(base_dir, "data", "password.txt")
         self._initialize_password()
+        # In-memory copy of the stored hash, re-read whenever the file's mtime changes
+        self._stored_hash = None
+        self._stored_mtime = None
     
     def _initialize_password(self):
         """Initialize password file with default password if not exists."""
@@ -21,18 +31,51 @@ class AuthManager:
             with open(self.password_file, 'w') as f:
                 f.write(hashed)
     
+    def _scrypt(self, password, salt):
+        """Derive the scrypt key for a password and salt."""
+        return hashlib.scrypt(
+            password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P,
+            maxmem=2 * 128 * SCRYPT_R * SCRYPT_N, dklen=32
+        )
+
     def _hash_password(self, password):
-        """Hash password using SHA256."""
-        return hashlib.sha256(password.encode()).hexdigest()
-    
+        """Hash password with scrypt and a random salt, stored as $scrypt$<salt>$<key>."""
+        salt = os.urandom(16)
+        return f"{SCRYPT_PREFIX}{salt.hex()}${self._scrypt(password, salt).hex()}"
+
+    def _check_hash(self, password, stored_hash):
+        """Constant-time check of a password against a stored scrypt or legacy SHA256 hash."""
+        if stored_hash.startswith(SCRYPT_PREFIX):
+            salt_hex, key_hex = stored_hash[len(SCRYPT_PREFIX):].split("$", 1)
+            return hmac.compare_digest(self._scrypt(password, bytes.fromhex(salt_hex)).hex(), key_hex)
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored_hash)
+
+    def _current_hash(self):
+        """The stored hash, re-read only when the file changed, e.g. a password change in another session."""
+        mtime = os.stat(self.password_file).st_mtime_ns
+        if mtime != self._stored_mtime:
+            with open(self.password_file, 'r') as f:
+                self._stored_hash = f.read().strip()
+            self._stored_mtime = mtime
+        return self._stored_hash
+
+    def _store_hash(self, new_hash):
+        """Write a password hash to disk and keep the in-memory copy in sync."""
+        with open(self.password_file, 'w') as f:
+            f.write(new_hash)
+        self._stored_hash = new_hash
+        self._stored_mtime = os.stat(self.password_file).st_mtime_ns
+
     def verify_password(self, password):
         """Verify if password matches stored hash."""
         try:
-            with open(self.password_file, 'r') as f:
-                stored_hash = f.read().strip()
-            
-            input_hash = self._hash_password(password)
-            return input_hash == stored_hash
+            stored_hash = self._current_hash()
+            if not self._check_hash(password, stored_hash):
+                return False
+            if not stored_hash.startswith(SCRYPT_PREFIX):
+                # Upgrade a legacy SHA256 hash now that the plain password is known
+                self._store_hash(self._hash_password(password))
+            return True
         except Exception as e:
             st.error(f"Error verifying password: {str(e)}")
             return False
@@ -41,9 +84,7 @@ class AuthManager:
         """Change password if old password is correct."""
         if self.verify_password(old_password):
             try:
-                new_hash = self._hash_password(new_password)
-                with open(self.password_file, 'w') as f:
-                    f.write(new_hash)
+                self._store_hash(self._hash_password(new_password))
                 return True
             except Exception as e:
                 st.error(f"Error changing password: {str(e)}")
@@ -1,20 +1,46 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from collections import Counter
+import itertools
 import os
-from datetime import datetime, date
+from datetime import datetime
 import streamlit as st
-from sheets_manager import SheetsManager
-import gspread
-import toml
+from sheets_manager import get_sheets_manager
+from utils import parse_size_columns, parse_date_column, normalize_upload_columns, normalize_name
+
+# Data versions are drawn from one process-wide counter, so cache keys built from them
+# never collide between sessions and writes need not clear every cached function
+_DATA_VERSIONS = itertools.count(1)
+
+# Transaction text columns held as categoricals once read
+_TRANSACTION_CATEGORICAL_COLUMNS = ('category', 'subcategory', 'transaction_type', 'supplier')
+
+@st.cache_resource(show_spinner=False, max_entries=6)
+def _read_parquet_shared(path, mtime):
+    """Parse a local Parquet table once per file version for all sessions; callers must not modify the result."""
+    return pd.read_parquet(path, engine='pyarrow')
+
+def _parquet_schema(headers, int_columns=(), float_columns=()):
+    """Arrow schema for a locally stored table: the listed numeric columns, text everywhere else."""
+    return pa.schema([
+        (name, pa.int64() if name in int_columns else pa.float64() if name in float_columns else pa.string())
+        for name in headers
+    ])
 
-def clear_transaction_cache():
-    st.cache_data.clear()
 class DataManager:
-    API_VERSION = 5  # Incremented for Google Sheets support
+    API_VERSION = 7  # Incremented for process-unique data versions and uncached readers
+    # Columns that identify a stored record; each is its table's leading headers
+    _TRANSACTION_KEY = ['id']
+    _STOCK_KEY = ['category', 'subcategory']
     def __init__(self):
         self.api_version = self.API_VERSION
+        # Replaced on every successful write so callers can key caches on it
+        self.data_version = next(_DATA_VERSIONS)
         # Initialize Google Sheets manager
         # Don't access st.secrets here - let SheetsManager handle it lazily
-        self.sheets_manager = SheetsManager()
+        self.sheets_manager = get_sheets_manager()
         # Don't check is_configured() immediately - it might try to access st.secrets too early
         # We'll check it lazily when actually needed (in _read/write methods)
         self._use_sheets = None  # Cache for lazy evaluation
@@ -36,19 +62,39 @@ class DataManager:
             'id', 'template_name', 'category', 'subcategory', 'supplier', 'created_at'
         ]
         
-        # Fallback: legacy CSV file paths (for migration or backup)
+        # Fallback: local Parquet files when Google Sheets is not configured
         base_dir = os.path.dirname(os.path.abspath(__file__))
         self.data_dir = os.path.join(base_dir, "data")
-        self.transactions_file = os.path.join(self.data_dir, "transactions.csv")
-        self.stock_file = os.path.join(self.data_dir, "current_stock.csv")
-        self.templates_file = os.path.join(self.data_dir, "templates.csv")
+        self.transactions_file = os.path.join(self.data_dir, "transactions.parquet")
+        self.stock_file = os.path.join(self.data_dir, "current_stock.parquet")
+        self.templates_file = os.path.join(self.data_dir, "templates.parquet")
+        self.transactions_schema = _parquet_schema(self.transactions_headers, int_columns=('id',), float_columns=('quantity',))
+        self.stock_schema = _parquet_schema(self.stock_headers, float_columns=('remaining_qty',))
+        self.templates_schema = _parquet_schema(self.templates_headers, int_columns=('id',))
+        # Legacy CSV files, migrated to Parquet on startup and left in place as a backup
+        self.legacy_transactions_file = os.path.join(self.data_dir, "transactions.csv")
+        self.legacy_stock_file = os.path.join(self.data_dir, "current_stock.csv")
+        self.legacy_templates_file = os.path.join(self.data_dir, "templates.csv")
+        # Local tables already read from disk, keyed by path: (file mtime, DataFrame)
+        self._local_frames = {}
+        # Read cache hits and misses, keyed by (cache layer, 'hits' or 'misses')
+        self._cache_stats = Counter()
+        self._cache_last_access = None
+        # Next free id per table, so inserts need not scan the id column
+        self._next_ids = {}
+        # (category, subcategory) key index over current stock; dropped whenever stock is rewritten
+        self._stock_index = None
+        # (templates frame, {(category, template_name): record}) for template lookups by name
+        self._template_lookup = None
         
         self._initialize_data_files()
 
     def _ensure_numeric_types(self, df: pd.DataFrame, df_type: str) -> pd.DataFrame:
         """Ensure numeric columns have proper types to prevent PyArrow errors.
-        Always converts, even if dtype appears correct, to handle mixed types."""
-        if df.empty:
+        Frames that already have the stored types (e.g. read back from Parquet) are returned as is;
+        anything else, including mixed object columns, is converted.
+        Transaction dates are parsed to datetime64 here so callers never re-parse them."""
+        if df.empty or self._has_numeric_types(df, df_type):
             return df
         df = df.copy()
         try:
@@ -59,9 +105,15 @@ class DataManager:
                     df['id'] = df['id'].astype(int)
                 if 'quantity' in df.columns:
                     df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(0.0)
+                if 'date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['date']):
+                    df['date'] = parse_date_column(df['date'])
+                # Few distinct values over many rows: categoricals are smaller and compare integer codes
+                for col in _TRANSACTION_CATEGORICAL_COLUMNS:
+                    if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                        df[col] = df[col].astype('category')
             elif df_type == "stock":
                 if 'remaining_qty' in df.columns:
-                    df['remaining_qty'] = pd.to_numeric(df['remaining_qty'], errors='coerce').fillna(0.0)
+                    df['remaining_qty'] = pd.to_numeric(df['remaining_qty'], errors='coerce').fillna(0.0).astype('float64')
             elif df_type == "templates":
                 if 'id' in df.columns:
                     # Convert to numeric first, then to int - handles strings, floats, etc.
@@ -72,22 +124,64 @@ class DataManager:
             pass
         return df
     
+    def _has_numeric_types(self, df: pd.DataFrame, df_type: str) -> bool:
+        """Whether a frame already has the column types _ensure_numeric_types would give it."""
+        checks = {
+            "transactions": {'id': pd.api.types.is_integer_dtype, 'quantity': pd.api.types.is_numeric_dtype,
+                             'date': pd.api.types.is_datetime64_any_dtype,
+                             **{col: lambda values: isinstance(values.dtype, pd.CategoricalDtype)
+                                for col in _TRANSACTION_CATEGORICAL_COLUMNS}},
+            "stock": {'remaining_qty': lambda values: values.dtype == np.float64},
+            "templates": {'id': pd.api.types.is_integer_dtype},
+        }[df_type]
+        return all(check(df[col]) for col, check in checks.items() if col in df.columns)
+
+    def _count_cache_access(self, layer: str, hit: bool):
+        """Record a hit or miss for one of the read caches."""
+        self._cache_stats[(layer, 'hits' if hit else 'misses')] += 1
+        self._cache_last_access = datetime.now()
+
+    def get_cache_stats(self):
+        """Hit/miss counts and hit ratios for the session table cache and the local file cache."""
+        stats = {}
+        for layer in ('session', 'local_file'):
+            hits = self._cache_stats[(layer, 'hits')]
+            misses = self._cache_stats[(layer, 'misses')]
+            stats[layer] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': hits / (hits + misses) if hits + misses else 0.0,
+            }
+        stats['last_access'] = self._cache_last_access
+        return stats
+
     def _get_cached_sheet(self, key: str, headers: list, reader_func):
         """Cache Google Sheet data in Streamlit session_state to reduce API calls."""
+        df_type = "transactions" if key == "transactions" else ("stock" if key == "current_stock" else "templates")
+        self._count_cache_access('session', key in st.session_state)
+        if key not in st.session_state and self._get_use_sheets():
+            # Cold start on Sheets: load both session-cached tables concurrently
+            self._prefetch_sheets()
         if key not in st.session_state:
             df = reader_func(headers)
             # Convert types immediately after reading using helper function
-            df_type = "transactions" if key == "transactions" else ("stock" if key == "current_stock" else "templates")
-            df = self._ensure_numeric_types(df, df_type)
-            st.session_state[key] = df
-        else:
-            # Always ensure proper types even for cached data (in case cache has old string types)
-            df = st.session_state[key].copy()
-            df_type = "transactions" if key == "transactions" else ("stock" if key == "current_stock" else "templates")
-            df = self._ensure_numeric_types(df, df_type)
-            # Update cache with converted dataframe to prevent future issues
-            st.session_state[key] = df
-        return st.session_state[key]
+            st.session_state[key] = self._ensure_numeric_types(df, df_type)
+        elif not self._has_numeric_types(st.session_state[key], df_type):
+            # Cached data from an older session may still hold string types
+            st.session_state[key] = self._ensure_numeric_types(st.session_state[key], df_type)
+        # Shallow copy: callers can modify their frame without touching the cached one
+        return st.session_state[key].copy(deep=False)
+
+    def _prefetch_sheets(self):
+        """Fetch transactions and stock from Google Sheets concurrently when neither is loaded yet."""
+        if "transactions" in st.session_state or "current_stock" in st.session_state:
+            return
+        frames = self.sheets_manager.read_dataframes([
+            (self.transactions_sheet, self.transactions_headers),
+            (self.stock_sheet, self.stock_headers),
+        ])
+        st.session_state["transactions"] = self._ensure_numeric_types(frames[self.transactions_sheet], "transactions")
+        st.session_state["current_stock"] = self._ensure_numeric_types(frames[self.stock_sheet], "stock")
 
     # Backwards compatibility for any cached functions referencing the old helper
     def get_cached_sheet(self, key: str, headers: list, reader_func):
@@ -104,7 +198,7 @@ class DataManager:
         return self._use_sheets
     
     def _initialize_data_files(self):
-        """Initialize Google Sheets worksheets or CSV files if they don't exist."""
+        """Initialize Google Sheets worksheets or local Parquet files if they don't exist."""
         if self._get_use_sheets():
             # Initialize Google Sheets worksheets
             errors = []
@@ -134,53 +228,152 @@ class DataManager:
                 except (NameError, AttributeError, RuntimeError):
                     print(f"WARNING: {error_summary}")
         else:
-            # Fallback: initialize CSV files
+            # Fallback: initialize local Parquet files, migrating any legacy CSV data
             if not os.path.exists(self.data_dir):
                 os.makedirs(self.data_dir)
-            
-            if not os.path.exists(self.transactions_file):
-                transactions_df = pd.DataFrame(columns=self.transactions_headers)
-                transactions_df.to_csv(self.transactions_file, index=False)
-            
-            if not os.path.exists(self.stock_file):
-                stock_df = pd.DataFrame(columns=self.stock_headers)
-                stock_df.to_csv(self.stock_file, index=False)
-            
-            if not os.path.exists(self.templates_file):
-                templates_df = pd.DataFrame(columns=self.templates_headers)
-                templates_df.to_csv(self.templates_file, index=False)
+
+            local_tables = [
+                (self.transactions_file, self.legacy_transactions_file, self.transactions_schema),
+                (self.stock_file, self.legacy_stock_file, self.stock_schema),
+                (self.templates_file, self.legacy_templates_file, self.templates_schema),
+            ]
+            for path, legacy_path, schema in local_tables:
+                if os.path.exists(path):
+                    continue
+                df = pd.DataFrame(columns=schema.names)
+                if os.path.exists(legacy_path):
+                    try:
+                        # Everything as text: no type inference, _write_local applies the schema
+                        df = pd.read_csv(legacy_path, engine='pyarrow', dtype=str)
+                    except Exception as e:
+                        # Leave the Parquet file uncreated so the migration runs again next start
+                        st.error(f"Error migrating {os.path.basename(legacy_path)} to Parquet: {str(e)}")
+                        continue
+                self._write_local(df, path, schema)
+
+    def _write_local(self, df: pd.DataFrame, path: str, schema: pa.Schema):
+        """Write a table to its local Parquet file, coerced to the table's schema."""
+        df = df.reindex(columns=schema.names)
+        for field in schema:
+            values = df[field.name]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype(object)
+            if pa.types.is_integer(field.type):
+                df[field.name] = pd.to_numeric(values, errors='coerce').fillna(0).astype('int64')
+            elif pa.types.is_floating(field.type):
+                df[field.name] = pd.to_numeric(values, errors='coerce').astype('float64')
+            else:
+                df[field.name] = values.where(values.isna(), values.astype(str))
+        pq.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False), path, compression='zstd')
+        self._local_frames[path] = (os.path.getmtime(path), df)
+
+    def _read_local(self, path: str, headers: list) -> pd.DataFrame:
+        """Read a local Parquet table, reusing the in-memory copy until the file changes on disk."""
+        try:
+            mtime = os.path.getmtime(path)
+        except FileNotFoundError:
+            # _initialize_data_files creates the files; one removed since then reads as empty
+            return pd.DataFrame(columns=headers)
+        cached = self._local_frames.get(path)
+        self._count_cache_access('local_file', cached is not None and cached[0] == mtime)
+        if cached is None or cached[0] != mtime:
+            # Parse errors propagate: a damaged file read as an empty table would be overwritten on the next write
+            cached = (mtime, _read_parquet_shared(path, mtime))
+            self._local_frames[path] = cached
+        # Shallow copy: callers get their own frame without duplicating the column data
+        return cached[1].copy(deep=False)
+
+    def _read_source(self, sheet_name: str, local_file: str, headers: list) -> pd.DataFrame:
+        """Read a table from Google Sheets, or from its local Parquet file when Sheets is not configured."""
+        if self._get_use_sheets():
+            return self.sheets_manager.read_dataframe(sheet_name, headers)
+        return self._read_local(local_file, headers)
+
+    def _write_table(self, sheet_name: str, local_file: str, schema: pa.Schema, headers: list, df: pd.DataFrame) -> bool:
+        """Write a whole table to Google Sheets, or to its local Parquet file when Sheets is not configured."""
+        if self._get_use_sheets():
+            return self.sheets_manager.write_dataframe(sheet_name, df, headers)
+        self._write_local(df, local_file, schema)
+        return True
                 
-    @st.cache_data(ttl=600)
-    def _read_transactions(_self) -> pd.DataFrame:
+    def _read_transactions(self) -> pd.DataFrame:
         """Read 'Transactions' with persistent session caching."""
-        df = _self._get_cached_sheet(
+        return self._get_cached_sheet(
             "transactions",
-            _self.transactions_headers,
-            lambda headers: _self.sheets_manager.read_dataframe(
-                _self.transactions_sheet, headers
+            self.transactions_headers,
+            lambda headers: self._read_source(
+                self.transactions_sheet, self.transactions_file, headers
             ),
         )
-        # Convert numeric columns from strings (Google Sheets returns all as strings)
-        if not df.empty:
-            if 'id' in df.columns:
-                df['id'] = pd.to_numeric(df['id'], errors='coerce').fillna(0).astype(int)
-            if 'quantity' in df.columns:
-                df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(0)
-        return df
 
     
-    def _write_transactions(self, df: pd.DataFrame) -> bool:
-        """Write transactions to Google Sheets or CSV."""
-        success = False
-        if self._get_use_sheets():
-            success = self.sheets_manager.write_dataframe(
-                self.transactions_sheet, 
-                df, 
+    def _format_dates_for_storage(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Render the parsed date column back to the 'YYYY-MM-DD' text that storage holds."""
+        if df.empty or 'date' not in df.columns:
+            return df
+        df = df.copy()
+        df['date'] = parse_date_column(df['date']).dt.strftime('%Y-%m-%d').fillna('')
+        return df
+
+    def _stored_prefix_length(self, df: pd.DataFrame):
+        """Row count of the last stored transactions if df only adds rows after them, otherwise None."""
+        previous = st.session_state.get("transactions")
+        if previous is None or 'id' not in df.columns or len(df) <= len(previous):
+            return None
+        stored_ids = pd.to_numeric(df['id'].iloc[:len(previous)], errors='coerce').to_numpy()
+        if not np.array_equal(stored_ids, previous['id'].to_numpy()):
+            return None
+        return len(previous)
+
+    def _only_deletes(self, df: pd.DataFrame, key: str, deleted_rows, key_columns) -> bool:
+        """Whether df is the cached table under key with just the rows at deleted_rows removed, compared on key_columns."""
+        previous = st.session_state.get(key)
+        if deleted_rows is None or previous is None or len(previous) - len(deleted_rows) != len(df):
+            return False
+        kept = np.delete(previous[list(key_columns)].astype(str).to_numpy(), deleted_rows, axis=0)
+        return np.array_equal(kept, df[list(key_columns)].astype(str).to_numpy())
+
+    def _sheet_matches(self, key: str, sheet_name: str, headers: list, key_columns) -> bool:
+        """Whether the sheet still holds the cached table under key row for row, compared on key_columns
+        (its leading headers). Positions taken from the cached table only address the right sheet rows
+        if no other session, or manual edit, has inserted, removed or reordered rows since it was read."""
+        stored = self.sheets_manager.read_key_columns(sheet_name, headers, len(key_columns))
+        previous = st.session_state.get(key)
+        if stored is None or previous is None:
+            return False
+        return stored == previous[list(key_columns)].astype(str).values.tolist()
+
+    def _updates_in_place(self, df: pd.DataFrame, key: str, sheet_name: str, headers: list, key_columns) -> bool:
+        """Whether df keeps the cached table's records at the same positions (compared on key_columns)
+        and the sheet still holds them there, so changed rows can be overwritten by position."""
+        previous = st.session_state.get(key)
+        if previous is None or len(df) < len(previous):
+            return False
+        kept = df[list(key_columns)].iloc[:len(previous)].astype(str).to_numpy()
+        return (np.array_equal(kept, previous[list(key_columns)].astype(str).to_numpy())
+                and self._sheet_matches(key, sheet_name, headers, key_columns))
+
+    def _write_transactions(self, df: pd.DataFrame, deleted_rows=None) -> bool:
+        """Write transactions to Google Sheets or the local Parquet file.
+        deleted_rows are the positions of stored rows that df leaves out, if that is its only change."""
+        use_sheets = self._get_use_sheets()
+        stored_rows = self._stored_prefix_length(df) if use_sheets else None
+        if (use_sheets and self._only_deletes(df, "transactions", deleted_rows, self._TRANSACTION_KEY)
+                and self._sheet_matches("transactions", self.transactions_sheet, self.transactions_headers, self._TRANSACTION_KEY)):
+            # Only rows removed: delete them from the sheet instead of rewriting it
+            success = self.sheets_manager.delete_rows(self.transactions_sheet, [row + 2 for row in deleted_rows])
+        elif stored_rows is not None:
+            # Only new rows at the end: append them instead of rewriting the whole sheet
+            success = self.sheets_manager.append_dataframe(
+                self.transactions_sheet,
+                self._format_dates_for_storage(df.iloc[stored_rows:]),
                 self.transactions_headers
             )
         else:
-            df.to_csv(self.transactions_file, index=False)
-            success = True
+            success = self._write_table(
+                self.transactions_sheet, self.transactions_file, self.transactions_schema,
+                self.transactions_headers, self._format_dates_for_storage(df)
+            )
 
         if success:
             try:
@@ -189,37 +382,43 @@ class DataManager:
                 st.session_state["transactions"] = df_cached
             except Exception:
                 pass
-            st.cache_data.clear()
+            self.data_version = next(_DATA_VERSIONS)
 
         return success
    
-    @st.cache_data(ttl=600)
-    def _read_stock(_self) -> pd.DataFrame:
+    def _read_stock(self) -> pd.DataFrame:
         """Read 'Current Stock' with persistent session caching."""
-        df = _self._get_cached_sheet(
+        return self._get_cached_sheet(
             "current_stock",
-            _self.stock_headers,
-            lambda headers: _self.sheets_manager.read_dataframe(
-                _self.stock_sheet, headers
+            self.stock_headers,
+            lambda headers: self._read_source(
+                self.stock_sheet, self.stock_file, headers
             ),
         )
-        # Convert numeric columns from strings (Google Sheets returns all as strings)
-        if not df.empty:
-            if 'remaining_qty' in df.columns:
-                df['remaining_qty'] = pd.to_numeric(df['remaining_qty'], errors='coerce').fillna(0)
-        return df
-    def _write_stock(self, df: pd.DataFrame) -> bool:
-        """Write stock to Google Sheets or CSV."""
-        success = False
-        if self._get_use_sheets():
-            success = self.sheets_manager.write_dataframe(
-                self.stock_sheet, 
-                df, 
-                self.stock_headers
-            )
+    def _write_stock(self, df: pd.DataFrame, changed_rows=None, deleted_rows=None) -> bool:
+        """Write stock to Google Sheets or the local Parquet file.
+        changed_rows are the positions of the only rows that differ from the stored stock, if known;
+        deleted_rows are the positions of stored rows that df leaves out, if that is its only change."""
+        use_sheets = self._get_use_sheets()
+        previous = st.session_state.get("current_stock")
+        if (use_sheets and self._only_deletes(df, "current_stock", deleted_rows, self._STOCK_KEY)
+                and self._sheet_matches("current_stock", self.stock_sheet, self.stock_headers, self._STOCK_KEY)):
+            success = self.sheets_manager.delete_rows(self.stock_sheet, [row + 2 for row in deleted_rows])
+        elif (use_sheets and changed_rows and previous is not None and 0 <= len(df) - len(previous) <= 1
+                and (changed_rows[0] >= len(previous)
+                     or self._updates_in_place(df, "current_stock", self.stock_sheet, self.stock_headers, self._STOCK_KEY))):
+            # Changed records: update their rows in place in one request, or append the record if it is new
+            rows_values = df.iloc[changed_rows][self.stock_headers].astype(object)
+            rows_values = rows_values.where(rows_values.notna(), "").values.tolist()
+            if changed_rows[0] < len(previous):
+                # Sheet rows are 1-indexed below the header row
+                success = self.sheets_manager.update_rows(
+                    self.stock_sheet, [(row + 2, values) for row, values in zip(changed_rows, rows_values)], self.stock_headers
+                )
+            else:
+                success = self.sheets_manager.append_row(self.stock_sheet, rows_values[0], self.stock_headers)
         else:
-            df.to_csv(self.stock_file, index=False)
-            success = True
+            success = self._write_table(self.stock_sheet, self.stock_file, self.stock_schema, self.stock_headers, df)
 
         if success:
             try:
@@ -228,53 +427,68 @@ class DataManager:
                 st.session_state["current_stock"] = df_cached
             except Exception:
                 pass
-            st.cache_data.clear()
+            self._stock_index = None
+            self.data_version = next(_DATA_VERSIONS)
 
         return success
     
     def _read_templates(self) -> pd.DataFrame:
-        """Read templates from Google Sheets or CSV."""
-        if self._get_use_sheets():
-            df = self.sheets_manager.read_dataframe(
-                self.templates_sheet, 
-                self.templates_headers
-            )
-            # Convert numeric columns from strings (Google Sheets returns all as strings)
-            if not df.empty and 'id' in df.columns:
-                df['id'] = pd.to_numeric(df['id'], errors='coerce').fillna(0).astype(int)
-            return df
-        else:
-            try:
-                df = pd.read_csv(self.templates_file)
-                # Ensure id is numeric for CSV as well
-                if not df.empty and 'id' in df.columns:
-                    df['id'] = pd.to_numeric(df['id'], errors='coerce').fillna(0).astype(int)
-                return df
-            except Exception:
-                return pd.DataFrame(columns=self.templates_headers)
+        """Read templates from Google Sheets or the local Parquet file."""
+        # Sheets returns ids as strings; Parquet already stores them as int64, so this is a no-op there
+        return self._ensure_numeric_types(
+            self._read_source(self.templates_sheet, self.templates_file, self.templates_headers), "templates"
+        )
     
     def _write_templates(self, df: pd.DataFrame) -> bool:
-        """Write templates to Google Sheets or CSV."""
-        success = False
-        if self._get_use_sheets():
-            success = self.sheets_manager.write_dataframe(
-                self.templates_sheet, 
-                df, 
-                self.templates_headers
-            )
-        else:
-            df.to_csv(self.templates_file, index=False)
-            success = True
+        """Write templates to Google Sheets or the local Parquet file."""
+        success = self._write_table(self.templates_sheet, self.templates_file, self.templates_schema, self.templates_headers, df)
 
         if success:
             try:
                 st.session_state["templates"] = df.copy()
             except Exception:
                 pass
-            st.cache_data.clear()
+            self.data_version = next(_DATA_VERSIONS)
 
         return success
 
+    def _reserve_ids(self, table: str, df: pd.DataFrame, count: int = 1) -> int:
+        """Reserve count consecutive ids for new rows of a table and return the first one.
+        The running counter is seeded from the highest stored id once; after that only the last
+        row is checked, in case rows were appended elsewhere since."""
+        if table not in self._next_ids:
+            ids = pd.to_numeric(df['id'], errors='coerce').dropna() if 'id' in df.columns else pd.Series(dtype=float)
+            self._next_ids[table] = int(ids.max()) + 1 if len(ids) > 0 else 1
+        elif not df.empty and 'id' in df.columns:
+            last_id = pd.to_numeric(df['id'].iloc[-1:], errors='coerce').dropna()
+            if len(last_id) > 0:
+                self._next_ids[table] = max(self._next_ids[table], int(last_id.iloc[0]) + 1)
+        start_id = self._next_ids[table]
+        self._next_ids[table] = start_id + count
+        return start_id
+
+    def _append_record(self, df: pd.DataFrame, record: dict, headers: list) -> pd.DataFrame:
+        """Append one record to a table read from storage, in a single concat."""
+        if df.empty:
+            return pd.DataFrame([record], columns=headers)
+        return self._append_rows(df, pd.DataFrame([record], columns=df.columns))
+
+    def _append_rows(self, df: pd.DataFrame, new_rows: pd.DataFrame) -> pd.DataFrame:
+        """Concat new rows onto a table, keeping its categorical columns categorical.
+        Plain concat would decode them to strings, and the next read would re-encode the whole column."""
+        df = df.copy(deep=False)
+        new_rows = new_rows.copy(deep=False)
+        for col in df.columns:
+            dtype = df[col].dtype
+            if not isinstance(dtype, pd.CategoricalDtype) or col not in new_rows.columns:
+                continue
+            # Added categories go after the existing ones, so stored codes stay valid
+            missing = pd.Index(new_rows[col].dropna().unique()).difference(dtype.categories)
+            if len(missing) > 0:
+                df[col] = df[col].cat.add_categories(missing)
+            new_rows[col] = new_rows[col].astype(df[col].dtype)
+        return pd.concat([df, new_rows], ignore_index=True)
+
     def add_transaction(self, category, subcategory, transaction_type, quantity, transaction_date, supplier="", notes=""):
         """Add a new transaction and update stock levels."""
         try:
@@ -282,109 +496,101 @@ class DataManager:
             transactions_df = self._read_transactions()
 
             # Generate new transaction ID
-            if not transactions_df.empty and 'id' in transactions_df.columns:
-                # Ensure id column is numeric before finding max
-                ids = pd.to_numeric(transactions_df['id'], errors='coerce').dropna()
-                if len(ids) > 0:
-                    new_id = int(ids.max()) + 1
-                else:
-                    new_id = 1
-            else:
-                new_id = 1
+            new_id = self._reserve_ids("transactions", transactions_df)
 
             # Create new transaction record
             # Normalize inputs
-            category = str(category).strip()
-            subcategory = str(subcategory).strip()
+            category = normalize_name(category)
+            subcategory = normalize_name(subcategory)
             transaction_type = str(transaction_type).strip().title()
             quantity = float(quantity)
+            # One timestamp for the transaction and the stock record it updates
+            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             new_transaction = {
                 'id': new_id,
                 'category': category,
                 'subcategory': subcategory,
                 'transaction_type': transaction_type,
                 'quantity': quantity,
-                'date': transaction_date.strftime('%Y-%m-%d') if isinstance(transaction_date, (datetime, date)) else str(transaction_date),
+                # Same datetime64 type the stored date column is read back as, so the append keeps its dtype
+                'date': pd.to_datetime(transaction_date, errors='coerce').normalize(),
                 'supplier': supplier,
                 'notes': notes,
-                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                'created_at': timestamp
             }
 
-            # Add transaction to dataframe
-            new_transaction_df = pd.DataFrame([new_transaction])
-            transactions_df = pd.concat([transactions_df, new_transaction_df], ignore_index=True)
-            
-            # Ensure proper types after concatenation (important for PyArrow compatibility)
-            if 'id' in transactions_df.columns:
-                transactions_df['id'] = pd.to_numeric(transactions_df['id'], errors='coerce').fillna(0).astype(int)
-            if 'quantity' in transactions_df.columns:
-                transactions_df['quantity'] = pd.to_numeric(transactions_df['quantity'], errors='coerce').fillna(0)
+            # Add transaction to dataframe; the record is already typed like the stored columns,
+            # so the append needs no whole-table type coercion afterwards
+            transactions_df = self._append_record(transactions_df, new_transaction, self.transactions_headers)
+
+            # Work out the stock change from the cached stock before writing anything,
+            # so a failure here leaves both tables untouched
+            stock_df, stock_index, changed_rows = self._stock_with_transaction(
+                category, subcategory, transaction_type, quantity, timestamp, supplier
+            )
 
-            # Save transactions
+            # Save transactions, then the updated stock
             if not self._write_transactions(transactions_df):
                 raise RuntimeError("Failed to persist transactions to storage.")
-
-            # Update stock levels
-            if not self._update_stock_levels(category, subcategory, transaction_type, quantity, supplier):
+            if not self._write_stock(stock_df, changed_rows=changed_rows):
                 raise RuntimeError("Failed to update current stock.")
+            self._stock_index = stock_index
 
             return True
 
         except Exception as e:
+            # The stored ids may not be what the counter assumed; reseed on the next insert
+            self._next_ids.pop("transactions", None)
             st.error(f"Error adding transaction: {str(e)}")
             return False
 
-    def _update_stock_levels(self, category, subcategory, transaction_type, quantity, supplier="") -> bool:
-        """Update current stock levels based on transaction."""
+    def _stock_rows(self, stock_df, category, subcategory):
+        """Positions of a (category, subcategory) stock record, looked up in a hashed key index."""
+        if self._stock_index is None or len(self._stock_index) != len(stock_df):
+            self._stock_index = pd.MultiIndex.from_arrays([stock_df['category'], stock_df['subcategory']])
         try:
-            # Load current stock
-            stock_df = self._read_stock()
-            # Ensure numeric type for remaining_qty
-            if 'remaining_qty' in stock_df.columns:
-                stock_df['remaining_qty'] = pd.to_numeric(stock_df['remaining_qty'], errors='coerce').fillna(0)
-
-            # Find existing stock record
-            category = str(category).strip()
-            subcategory = str(subcategory).strip()
-            transaction_type = str(transaction_type).strip().title()
-            mask = (stock_df['category'] == category) & (stock_df['subcategory'] == subcategory)
-            existing_record = stock_df[mask]
-
-            # Compute current and new qty safely
-            current_qty = float(existing_record.iloc[0]['remaining_qty']) if not existing_record.empty else 0.0
-            delta = float(quantity)
-            if transaction_type == "Stock In":
-                new_qty = current_qty + delta
-            else:  # Stock Out
-                new_qty = max(0.0, current_qty - delta)
-
-            if not existing_record.empty:
-                # Update existing record
-                stock_df.loc[mask, 'remaining_qty'] = new_qty
-                stock_df.loc[mask, 'last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                if supplier:  # Update supplier if provided
-                    stock_df.loc[mask, 'supplier'] = supplier
-            else:
-                # Create new stock record
-                new_stock_record = {
-                    'category': category,
-                    'subcategory': subcategory,
-                    'remaining_qty': new_qty,
-                    'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'supplier': supplier
-                }
-                new_stock_df = pd.DataFrame([new_stock_record])
-                stock_df = pd.concat([stock_df, new_stock_df], ignore_index=True)
-
-            # Save updated stock
-            if not self._write_stock(stock_df):
-                raise RuntimeError("Failed to persist stock updates.")
-
-            return True
-
-        except Exception as e:
-            st.error(f"Error updating stock levels: {str(e)}")
-            return False
+            loc = self._stock_index.get_loc((category, subcategory))
+        except KeyError:
+            return np.array([], dtype=np.intp)
+        # get_loc gives an int, a slice or a mask depending on key uniqueness
+        return np.arange(len(stock_df))[loc].reshape(-1)
+
+    def _stock_with_transaction(self, category, subcategory, transaction_type, quantity, timestamp, supplier=""):
+        """Current stock with one normalized transaction applied and timestamp as its last_updated,
+        the key index that matches it, and the positions of the changed rows (several if the key has duplicate rows)."""
+        # Load current stock; a full copy since rows are updated in place below
+        stock_df = self._read_stock().copy()
+
+        # Find existing stock record
+        rows = self._stock_rows(stock_df, category, subcategory)
+
+        # Compute current and new qty safely
+        current_qty = float(stock_df['remaining_qty'].iloc[rows[0]]) if len(rows) else 0.0
+        delta = float(quantity)
+        if transaction_type == "Stock In":
+            new_qty = current_qty + delta
+        else:  # Stock Out
+            new_qty = max(0.0, current_qty - delta)
+
+        if len(rows):
+            # Update existing record
+            stock_df.iloc[rows, stock_df.columns.get_loc('remaining_qty')] = new_qty
+            stock_df.iloc[rows, stock_df.columns.get_loc('last_updated')] = timestamp
+            if supplier:  # Update supplier if provided
+                stock_df.iloc[rows, stock_df.columns.get_loc('supplier')] = supplier
+            # The keys are unchanged, so the index carries over the write
+            return stock_df, self._stock_index, rows.tolist()
+
+        # Create new stock record
+        new_stock_record = {
+            'category': category,
+            'subcategory': subcategory,
+            'remaining_qty': new_qty,
+            'last_updated': timestamp,
+            'supplier': supplier
+        }
+        stock_df = self._append_record(stock_df, new_stock_record, self.stock_headers)
+        return stock_df, self._stock_index.append(pd.MultiIndex.from_tuples([(category, subcategory)])), [len(stock_df) - 1]
 
     def recalculate_stock(self) -> bool:
         """Rebuild current stock sheet from all transactions to ensure consistency."""
@@ -397,41 +603,41 @@ class DataManager:
 
             df = transactions_df.copy()
             df['transaction_type'] = df['transaction_type'].astype(str).str.strip().str.title()
-            df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(0)
-
-            df['delta'] = df.apply(
-                lambda row: row['quantity'] if row['transaction_type'] == 'Stock In' else -row['quantity'],
-                axis=1
-            )
 
-            def _latest_non_empty(series):
-                for value in reversed(series.tolist()):
-                    if pd.notna(value) and str(value).strip():
-                        return value
-                return ""
+            df['delta'] = np.where(df['transaction_type'].to_numpy() == 'Stock In', 1.0, -1.0) * df['quantity'].to_numpy()
 
             agg_dict = {'delta': 'sum'}
-            if 'supplier' in df.columns:
-                agg_dict['supplier'] = _latest_non_empty
             if 'created_at' in df.columns:
                 agg_dict['created_at'] = 'max'
             if 'date' in df.columns:
                 agg_dict['date'] = 'max'
 
-            grouped = df.groupby(['category', 'subcategory'], as_index=False).agg(agg_dict)
+            keys = ['category', 'subcategory']
+            # Readers sort stock themselves, so keep first-seen order and skip the groupby sort
+            grouped = df.groupby(keys, as_index=False, sort=False, observed=True).agg(agg_dict)
+
+            if 'supplier' in df.columns:
+                # Latest non-blank supplier per item: filter blanks, then take each group's last row,
+                # rather than running a Python reducer over every group
+                supplier_text = df['supplier'].astype('string').str.strip().fillna('')
+                latest_supplier = (
+                    df.loc[supplier_text != '']
+                    .groupby(keys, sort=False, observed=True)['supplier'].last()
+                    .astype(object)
+                )
+                grouped = grouped.merge(latest_supplier.reset_index(), on=keys, how='left')
+                grouped['supplier'] = grouped['supplier'].fillna('')
 
-            # Ensure delta is numeric before calculating remaining_qty
-            grouped['delta'] = pd.to_numeric(grouped['delta'], errors='coerce').fillna(0)
             grouped['remaining_qty'] = grouped['delta'].clip(lower=0)
 
             last_timestamp = None
             if 'created_at' in grouped.columns:
-                last_timestamp = grouped['created_at']
+                last_timestamp = parse_date_column(grouped['created_at'], fmt='%Y-%m-%d %H:%M:%S')
             elif 'date' in grouped.columns:
-                last_timestamp = grouped['date']
+                last_timestamp = parse_date_column(grouped['date'])
 
             if last_timestamp is not None:
-                grouped['last_updated'] = pd.to_datetime(last_timestamp, errors='coerce').dt.strftime('%Y-%m-%d %H:%M:%S')
+                grouped['last_updated'] = last_timestamp.dt.strftime('%Y-%m-%d %H:%M:%S')
             else:
                 grouped['last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
@@ -439,8 +645,8 @@ class DataManager:
                 grouped['supplier'] = ""
 
             stock_df = grouped[['category', 'subcategory', 'remaining_qty', 'last_updated', 'supplier']]
-            # Ensure remaining_qty is numeric before comparison
-            stock_df['remaining_qty'] = pd.to_numeric(stock_df['remaining_qty'], errors='coerce').fillna(0)
+            # Stock is small and gets edited row by row, so its text columns go back to plain values
+            stock_df = stock_df.astype({'category': object, 'subcategory': object, 'supplier': object})
             stock_df = stock_df[stock_df['remaining_qty'] >= 0].reset_index(drop=True)
 
             return self._write_stock(stock_df)
@@ -449,14 +655,12 @@ class DataManager:
             st.error(f"Error recalculating stock: {str(e)}")
             return False
 
-    def get_current_stock(self, category):
+    def get_current_stock(self, category, stock_df=None):
         """Get current stock levels for a specific category."""
         try:
-            stock_df = self._read_stock()
+            if stock_df is None:
+                stock_df = self._read_stock()
             category_stock = stock_df[stock_df['category'] == category].copy()
-            # Ensure numeric type before filtering
-            if 'remaining_qty' in category_stock.columns:
-                category_stock['remaining_qty'] = pd.to_numeric(category_stock['remaining_qty'], errors='coerce').fillna(0)
 
             # Filter out zero quantities
             category_stock = category_stock[category_stock['remaining_qty'] > 0]
@@ -465,82 +669,115 @@ class DataManager:
             if not category_stock.empty:
                 category_stock = category_stock.sort_values('subcategory')
 
+            # Parse sheet sizes once here rather than on every cut-optimizer query
+            if category == "Paper":
+                category_stock['_sw'], category_stock['_sh'] = parse_size_columns(category_stock['subcategory'])
+
             return category_stock
 
         except Exception as e:
             st.error(f"Error getting current stock: {str(e)}")
             return pd.DataFrame()
 
-    def get_subcategories(self, category):
-        """Get existing subcategories for a category."""
+    def get_all_current_stock(self):
+        """Get current stock levels for every category in a single read."""
         try:
             stock_df = self._read_stock()
-            transactions_df = self._read_transactions()
 
-            # Get subcategories from both stock and transactions
-            stock_subcategories = stock_df[stock_df['category'] == category]['subcategory'].unique()
-            transaction_subcategories = transactions_df[transactions_df['category'] == category]['subcategory'].unique()
+            # Filter out zero quantities
+            stock_df = stock_df[stock_df['remaining_qty'] > 0]
 
-            # Combine and remove duplicates
-            all_subcategories = list(set(list(stock_subcategories) + list(transaction_subcategories)))
-            all_subcategories = [sub for sub in all_subcategories if pd.notna(sub) and sub != ""]
+            # Sort by category, then subcategory
+            if not stock_df.empty:
+                stock_df = stock_df.sort_values(['category', 'subcategory'])
 
-            return sorted(all_subcategories)
+            return stock_df
+
+        except Exception as e:
+            st.error(f"Error getting current stock: {str(e)}")
+            return pd.DataFrame(columns=self.stock_headers)
+
+    @staticmethod
+    def _category_subcategories(df, category):
+        """Distinct non-blank subcategory names recorded under a category, as an object array."""
+        if df.empty:
+            return np.array([], dtype=object)
+        names = np.asarray(df.loc[df['category'] == category, 'subcategory'].dropna().unique(), dtype=object)
+        return names[names != ""]
+
+    def get_subcategories(self, category, stock_df=None, transactions_df=None):
+        """Get existing subcategories for a category."""
+        try:
+            if stock_df is None:
+                stock_df = self._read_stock()
+            if transactions_df is None:
+                transactions_df = self._read_transactions()
+
+            # Union of both sources: a subcategory deleted from stock but kept in the history
+            # stays listed. np.union1d dedupes and sorts in one pass
+            return np.union1d(
+                self._category_subcategories(stock_df, category),
+                self._category_subcategories(transactions_df, category),
+            ).tolist()
 
         except Exception as e:
             st.error(f"Error getting subcategories: {str(e)}")
             return []
 
+    def _subcategory_mask(self, df, category_norm, subcategory_norms):
+        """Rows matching a category and any of the subcategories after whitespace normalization and casefold.
+        Each distinct value is normalized once, and rows are matched through their factorized codes."""
+        def _matches(values, wanted):
+            codes, uniques = pd.factorize(values)
+            # Stored names are normalized on write; older rows may still carry extra whitespace
+            names = pd.Index(uniques).astype(str).str.replace(r'\s+', ' ', regex=True).str.strip()
+            hits = names.str.casefold().isin(wanted)
+            # A trailing False catches code -1 (missing values)
+            return np.append(hits, False)[codes]
+
+        mask = _matches(df['category'], [category_norm])
+        # Subcategories are only checked on rows already in the category
+        rows = np.flatnonzero(mask)
+        if len(rows):
+            mask[rows] = _matches(df['subcategory'].iloc[rows], subcategory_norms)
+        return mask
+
     def delete_subcategory(self, category, subcategory, delete_transactions=False):
-        """Delete a subcategory from current stock, optionally remove its transactions."""
+        """Delete a subcategory (or a list of them) from current stock, optionally remove its transactions."""
         try:
             # Normalize inputs
-            category_norm = str(category).strip().lower()
-            subcategory_norm = str(subcategory).strip().lower()
+            category_norm = normalize_name(category).casefold()
+            subcategories = [subcategory] if isinstance(subcategory, str) else list(subcategory)
+            subcategory_norms = [normalize_name(sub).casefold() for sub in subcategories]
 
-            # Remove from current stock
+            # Remove from current stock; on Sheets only the matching rows are deleted
             stock_df = self._read_stock()
-
+            removed_stock = 0
             if not stock_df.empty:
-                # Build normalized columns to match robustly
-                stock_df['_cat_norm'] = stock_df['category'].astype(str).str.strip().str.lower()
-                stock_df['_sub_norm'] = stock_df['subcategory'].astype(str).str.strip().str.lower()
-
-                before_stock = len(stock_df)
-                stock_df = stock_df[~((stock_df['_cat_norm'] == category_norm) & (stock_df['_sub_norm'] == subcategory_norm))]
-                removed_stock = before_stock - len(stock_df)
-
-                # Drop helper cols before saving
-                stock_df = stock_df.drop(columns=['_cat_norm', '_sub_norm'], errors='ignore')
-                if not self._write_stock(stock_df):
+                matches = self._subcategory_mask(stock_df, category_norm, subcategory_norms)
+                removed_stock = int(matches.sum())
+                if removed_stock and not self._write_stock(stock_df[~matches], deleted_rows=np.flatnonzero(matches).tolist()):
                     raise RuntimeError("Failed to persist stock updates after deletion.")
-            else:
-                removed_stock = 0
 
             removed_txs = 0
             if delete_transactions:
                 tx_df = self._read_transactions()
                 if not tx_df.empty:
-                    tx_df['_cat_norm'] = tx_df['category'].astype(str).str.strip().str.lower()
-                    tx_df['_sub_norm'] = tx_df['subcategory'].astype(str).str.strip().str.lower()
-
-                    before_tx = len(tx_df)
-                    tx_df = tx_df[~((tx_df['_cat_norm'] == category_norm) & (tx_df['_sub_norm'] == subcategory_norm))]
-                    removed_txs = before_tx - len(tx_df)
-
-                    tx_df = tx_df.drop(columns=['_cat_norm', '_sub_norm'], errors='ignore')
-                if not self._write_transactions(tx_df):
-                    raise RuntimeError("Failed to persist updated transactions after deletion.")
+                    matches = self._subcategory_mask(tx_df, category_norm, subcategory_norms)
+                    removed_txs = int(matches.sum())
+                    if removed_txs and not self._write_transactions(tx_df[~matches], deleted_rows=np.flatnonzero(matches).tolist()):
+                        raise RuntimeError("Failed to persist updated transactions after deletion.")
 
             return True, removed_stock, removed_txs
         except Exception as e:
             st.error(f"Error deleting subcategory: {str(e)}")
             return False, 0, 0
 
-    def get_transaction_history(self, category, subcategory=None, limit=None):
+    def get_transaction_history(self, category, subcategory=None, limit=None, transactions_df=None):
         """Get transaction history for a category and optionally subcategory."""
         try:
-            transactions_df = self._read_transactions()
+            if transactions_df is None:
+                transactions_df = self._read_transactions()
 
             # Filter by category
             filtered_df = transactions_df[transactions_df['category'] == category]
@@ -563,6 +800,20 @@ class DataManager:
             st.error(f"Error getting transaction history: {str(e)}")
             return pd.DataFrame()
 
+    def get_category_bundle(self, category, history_limit=5):
+        """Get templates, subcategories, recent history and current stock for a category.
+
+        Stock and transactions are read once and shared by all four lookups.
+        """
+        stock_df = self._read_stock()
+        transactions_df = self._read_transactions()
+        return (
+            self.get_templates(category),
+            self.get_subcategories(category, stock_df=stock_df, transactions_df=transactions_df),
+            self.get_transaction_history(category, limit=history_limit, transactions_df=transactions_df),
+            self.get_current_stock(category, stock_df=stock_df),
+        )
+
     def get_recent_transactions(self, limit=10):
         """Get recent transactions across all categories."""
         try:
@@ -571,7 +822,11 @@ class DataManager:
             if not transactions_df.empty:
                 # Sort by created_at or date, descending
                 sort_column = 'created_at' if 'created_at' in transactions_df.columns else 'date'
-                recent_transactions = transactions_df.sort_values(sort_column, ascending=False).head(limit)
+                if transactions_df[sort_column].is_monotonic_increasing:
+                    # Rows are stored in the order they were added, so the newest are already at the end
+                    recent_transactions = transactions_df.iloc[::-1].head(limit)
+                else:
+                    recent_transactions = transactions_df.sort_values(sort_column, ascending=False).head(limit)
                 # Ensure proper types before returning
                 return self._ensure_numeric_types(recent_transactions, "transactions")
             else:
@@ -592,86 +847,89 @@ class DataManager:
             return pd.DataFrame()
 
     def bulk_upload(self, category, df, include_supplier=False):
-        """Bulk upload transactions from Excel file."""
+        """Bulk upload transactions from an Excel DataFrame or an iterable of DataFrame chunks."""
         try:
-            # Normalize column names: strip whitespace and convert to lowercase for comparison
-            df.columns = df.columns.str.strip()
-            normalized_df_columns = {col.lower(): col for col in df.columns}
-            
+            chunks = [df] if isinstance(df, pd.DataFrame) else df
             required_columns = ['subcategory', 'transaction_type', 'quantity', 'date']
             if include_supplier:
                 required_columns.append('supplier')
 
-            # Check if required columns exist (case-insensitive, ignoring whitespace)
-            missing_columns = []
-            column_mapping = {}
-            for req_col in required_columns:
-                found = False
-                for df_col_lower, df_col_original in normalized_df_columns.items():
-                    if df_col_lower == req_col.lower():
-                        column_mapping[req_col] = df_col_original
-                        found = True
-                        break
-                if not found:
-                    missing_columns.append(req_col)
-            
-            if missing_columns:
-                st.error(
-                    f"❌ **Missing required columns:** {', '.join(missing_columns)}\n\n"
-                    f"**Found columns in your file:** {', '.join(df.columns.tolist())}\n\n"
-                    f"**Required columns:** {', '.join(required_columns)}\n\n"
-                    f"**Optional columns:** notes"
-                )
-                return 0
-            
-            # Rename columns to standardized names using the mapping
-            df = df.rename(columns=column_mapping)
+            uploads = []
 
-            success_count = 0
+            for df in chunks:
+                # Normalize column names and aliases (a no-op for frames the upload page already normalized)
+                df.columns = normalize_upload_columns(df.columns)
 
-            for index, row in df.iterrows():
-                try:
-                    # Validate required fields
-                    if pd.isna(row['subcategory']) or pd.isna(row['quantity']) or pd.isna(row['date']):
-                        continue
+                # Check if required columns exist (case-insensitive, ignoring whitespace)
+                missing_columns = [col for col in required_columns if col not in df.columns]
+
+                if missing_columns:
+                    st.error(
+                        f"❌ **Missing required columns:** {', '.join(missing_columns)}\n\n"
+                        f"**Found columns in your file:** {', '.join(df.columns.tolist())}\n\n"
+                        f"**Required columns:** {', '.join(required_columns)}\n\n"
+                        f"**Optional columns:** notes"
+                    )
+                    return 0
 
-                    # Parse date
-                    transaction_date = pd.to_datetime(row['date']).date()
+                # Validate required fields
+                df = df.dropna(subset=['subcategory', 'quantity', 'date'])
+                if df.empty:
+                    continue
 
-                    # Get values with defaults
-                    subcategory = str(row['subcategory']).strip()
-                    transaction_type = str(row['transaction_type']).strip().title()
-                    quantity = float(row['quantity'])
-                    supplier = str(row.get('supplier', '')).strip() if include_supplier else ""
-                    notes = str(row.get('notes', '')).strip()
+                # Parse dates and quantities column-wise; unparsable cells become NaT/NaN
+                dates = df['date']
+                if not pd.api.types.is_datetime64_any_dtype(dates):
+                    dates = pd.to_datetime(dates, errors='coerce', format='mixed')
+                quantities = pd.to_numeric(df['quantity'], errors='coerce')
+                invalid = dates.isna() | quantities.isna()
+                if invalid.any():
+                    rows = ', '.join(str(index + 1) for index in df.index[invalid][:10])
+                    more = ' …' if invalid.sum() > 10 else ''
+                    st.warning(f"Skipped {int(invalid.sum())} row(s) with an invalid date or quantity: {rows}{more}")
+
+                def _text(column):
+                    if column not in df.columns:
+                        return pd.Series('', index=df.index)
+                    return df[column].fillna('').astype(str).str.strip()
+
+                upload = pd.DataFrame({
+                    'subcategory': df['subcategory'].astype(str).str.replace(r'\s+', ' ', regex=True).str.strip(),
+                    'transaction_type': df['transaction_type'].astype(str).str.strip().str.title(),
+                    'quantity': quantities.astype(float),
+                    'date': dates.dt.normalize(),
+                    'supplier': _text('supplier') if include_supplier else '',
+                    'notes': _text('notes'),
+                })
+                # Validate transaction type
+                upload = upload[~invalid & upload['transaction_type'].isin(['Stock In', 'Stock Out'])]
+                if not upload.empty:
+                    uploads.append(upload)
+
+            if not uploads:
+                return 0
 
-                    # Validate transaction type
-                    if transaction_type not in ['Stock In', 'Stock Out']:
-                        continue
+            new_transactions = pd.concat(uploads, ignore_index=True)
+            transactions_df = self._read_transactions()
 
-                    # Add transaction
-                    if self.add_transaction(
-                        category=category,
-                        subcategory=subcategory,
-                        transaction_type=transaction_type,
-                        quantity=quantity,
-                        transaction_date=transaction_date,
-                        supplier=supplier,
-                        notes=notes
-                    ):
-                        success_count += 1
-
-                except Exception as row_error:
-                    st.warning(f"Error processing row {index + 1}: {str(row_error)}")
-                    continue
+            # Number the new rows after the highest existing transaction ID
+            start_id = self._reserve_ids("transactions", transactions_df, len(new_transactions))
+            new_transactions.insert(0, 'id', np.arange(start_id, start_id + len(new_transactions)))
+            new_transactions.insert(1, 'category', normalize_name(category))
+            new_transactions['created_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+            transactions_df = self._append_rows(transactions_df, new_transactions[self.transactions_headers])
+            if not self._write_transactions(transactions_df):
+                raise RuntimeError("Failed to persist transactions to storage.")
 
-            if success_count > 0:
-                if not self.recalculate_stock():
-                    st.warning("Transactions saved, but stock sheet could not be fully refreshed. Please try recalculating later.")
+            # One rebuild from the full history replaces the per-row stock updates
+            if not self.recalculate_stock():
+                st.warning("Transactions saved, but stock sheet could not be fully refreshed. Please try recalculating later.")
 
-            return success_count
+            return len(new_transactions)
 
         except Exception as e:
+            self._next_ids.pop("transactions", None)
             st.error(f"Error in bulk upload: {str(e)}")
             return 0
 
@@ -679,6 +937,8 @@ class DataManager:
         """Save a product template for quick entry."""
         try:
             templates_df = self._read_templates()
+            category = normalize_name(category)
+            subcategory = normalize_name(subcategory)
 
             # Check if template name already exists for this category
             existing = templates_df[
@@ -691,15 +951,7 @@ class DataManager:
                 return False
 
             # Generate new template ID
-            if not templates_df.empty and 'id' in templates_df.columns:
-                # Ensure id column is numeric before finding max
-                ids = pd.to_numeric(templates_df['id'], errors='coerce').dropna()
-                if len(ids) > 0:
-                    new_id = int(ids.max()) + 1
-                else:
-                    new_id = 1
-            else:
-                new_id = 1
+            new_id = self._reserve_ids("templates", templates_df)
 
             # Create new template record
             new_template = {
@@ -712,12 +964,7 @@ class DataManager:
             }
 
             # Add template to dataframe
-            new_template_df = pd.DataFrame([new_template])
-            templates_df = pd.concat([templates_df, new_template_df], ignore_index=True)
-            
-            # Ensure proper types after concatenation (important for PyArrow compatibility)
-            if 'id' in templates_df.columns:
-                templates_df['id'] = pd.to_numeric(templates_df['id'], errors='coerce').fillna(0).astype(int)
+            templates_df = self._append_record(templates_df, new_template, self.templates_headers)
 
             # Save templates
             if not self._write_templates(templates_df):
@@ -726,6 +973,7 @@ class DataManager:
             return True
 
         except Exception as e:
+            self._next_ids.pop("templates", None)
             st.error(f"Error saving template: {str(e)}")
             return False
 
@@ -739,17 +987,24 @@ class DataManager:
             st.error(f"Error getting templates: {str(e)}")
             return pd.DataFrame()
 
+    def _template_records(self) -> dict:
+        """Templates keyed by (category, template_name), rebuilt whenever the stored templates change.
+        The read is served by the Sheets read cache or the local mtime cache, so templates saved or
+        deleted by another session show up once those caches see them."""
+        templates_df = self._read_templates()
+        if self._template_lookup is None or not self._template_lookup[0].equals(templates_df):
+            lookup = {}
+            for record in templates_df.to_dict('records'):
+                # The first template wins on duplicate keys, as the row scan returned it
+                lookup.setdefault((record['category'], record['template_name']), record)
+            self._template_lookup = (templates_df, lookup)
+        return self._template_lookup[1]
+
     def get_template_by_name(self, category, template_name):
         """Get a specific template by name and category."""
         try:
-            templates_df = self._read_templates()
-            template = templates_df[
-                (templates_df['category'] == category) & 
-                (templates_df['template_name'] == template_name)
-            ]
-            if len(template) > 0:
-                return template.iloc[0].to_dict()
-            return None
+            template = self._template_records().get((category, template_name))
+            return dict(template) if template is not None else None
         except Exception as e:
             st.error(f"Error getting template: {str(e)}")
             return None
@@ -1,23 +1,51 @@
+import importlib.util
 import os
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from typing import Optional, Dict, List, Tuple
 
-# Optional imports - only needed if Google Sheets is configured
-try:
-    import gspread
-    from google.oauth2.service_account import Credentials
-    GSPREAD_AVAILABLE = True
-except ImportError:
-    GSPREAD_AVAILABLE = False
-    gspread = None
-    Credentials = None
+# Google Sheets packages are optional and only looked up here; gspread's import chain is
+# slow, so they are imported on first use
+GSPREAD_AVAILABLE = (importlib.util.find_spec("gspread") is not None
+                     and importlib.util.find_spec("google.oauth2") is not None)
 
 try:
     import streamlit as st
 except ImportError:
     st = None
 
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:
+    add_script_run_ctx = get_script_run_ctx = None
+
+
+# API responses worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = (429, 500, 503)
+
+
+def _with_retry(call, *args, retry_on=RETRY_STATUS_CODES, max_attempts=5, **kwargs):
+    """
+    Run a gspread call, retrying transient API errors with exponential backoff and full jitter.
+    A Retry-After header on the error response is honoured instead of the computed delay.
+    Calls that are not safe to repeat should pass retry_on=(429,): a 5xx may come after the change was applied.
+    """
+    import gspread
+    for attempt in range(max_attempts):
+        try:
+            return call(*args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            if e.response.status_code not in retry_on or attempt == max_attempts - 1:
+                raise
+            retry_after = e.response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                time.sleep(int(retry_after))
+            else:
+                time.sleep(random.uniform(0, min(0.5 * 2 ** attempt, 8)))
+
 
 @st.cache_resource
 def get_client():
@@ -27,6 +55,9 @@ def get_client():
         st.warning("Google Sheets packages not installed. Please add `gspread` and `google-auth` to requirements.txt.")
         return None, None
 
+    import gspread
+    from google.oauth2.service_account import Credentials
+
     try:
         creds = None
         service_account_email = None
@@ -63,6 +94,10 @@ class SheetsManager:
         'https://www.googleapis.com/auth/spreadsheets',
         'https://www.googleapis.com/auth/drive'
     ]
+
+    # Worksheets with more rows than this are read as parallel windows of this many rows
+    CHUNK_ROWS = 5000
+    CHUNK_WORKERS = 4
     
     def __init__(self, spreadsheet_id: Optional[str] = None):
         """
@@ -80,12 +115,22 @@ class SheetsManager:
         else:
             self.spreadsheet_id = os.getenv("GOOGLE_SHEETS_ID")
 
-        self.client, self.service_account_email = get_client()
         self.spreadsheet = None
+        # get_sheets_manager shares one instance across sessions and threads; this guards its caches
+        self._lock = threading.RLock()
+        self._initialize_client()
+
+    def _initialize_client(self):
+        """
+        Take the process-wide client from get_client, so credentials are parsed and authorized
+        once per process, and open the spreadsheet if its ID is known.
+        """
+        self.client, self.service_account_email = get_client()
         
-        if self.client and self.spreadsheet_id:
+        if self.client and self.spreadsheet_id and self.spreadsheet is None:
+            import gspread
             try:
-                self.spreadsheet = self.client.open_by_key(self.spreadsheet_id)
+                self.spreadsheet = _with_retry(self.client.open_by_key, self.spreadsheet_id)
             except gspread.exceptions.SpreadsheetNotFound:
                 st.error(f"Spreadsheet with ID '{self.spreadsheet_id}' not found or not shared with service account.")
                 self.spreadsheet = None
@@ -139,9 +184,8 @@ class SheetsManager:
 
         # Ensure client is initialized
         if not self.client:
-            if hasattr(self, "_initialize_client"):
-                self._initialize_client()
-            else:
+            self._initialize_client()
+            if not self.client:
                 raise RuntimeError("Google Sheets client not initialized.")
 
         # Ensure spreadsheet ID is known
@@ -153,7 +197,7 @@ class SheetsManager:
 
         # Open the spreadsheet using gspread
         try:
-            self.spreadsheet = self.client.open_by_key(self.spreadsheet_id)
+            self.spreadsheet = _with_retry(self.client.open_by_key, self.spreadsheet_id)
             return self.spreadsheet
         except Exception as e:
             if st and hasattr(st, "error"):
@@ -166,8 +210,9 @@ class SheetsManager:
         if not self.spreadsheet_id:
             self.spreadsheet_id = self._get_spreadsheet_id()
         
-        # If we now have a spreadsheet_id but no client, try to initialize
-        if self.spreadsheet_id and not self.client:
+        # The manager is shared by every session, so a client or spreadsheet that failed to
+        # load earlier (network error, sheet not yet shared) is retried rather than kept
+        if self.spreadsheet_id and (not self.client or self.spreadsheet is None):
             self._initialize_client()
         
         return self.client is not None and self.spreadsheet is not None
@@ -187,30 +232,42 @@ class SheetsManager:
     def get_or_create_worksheet(self, sheet_name: str, headers: List[str]):
         """
         Get or create worksheet, cached to avoid hitting Google API rate limits.
+        The lock only covers the cache: API calls and their retry backoff run outside it,
+        so one rate-limited lookup does not hold up every session.
         """
-        if not hasattr(self, "_ws_cache"):
-            self._ws_cache = {}
+        with self._lock:
+            if not hasattr(self, "_ws_cache"):
+                self._ws_cache = {}
 
-        # ✅ Local cache: only call API once per session per sheet
-        if sheet_name in self._ws_cache:
-            return self._ws_cache[sheet_name]
+            # ✅ Local cache: only call API once per session per sheet
+            if sheet_name in self._ws_cache:
+                return self._ws_cache[sheet_name]
 
         try:
+            import gspread
             spreadsheet = self.get_spreadsheet()
             try:
-                worksheet = spreadsheet.worksheet(sheet_name)
+                worksheet = _with_retry(spreadsheet.worksheet, sheet_name)
             except gspread.exceptions.WorksheetNotFound:
                 # Create worksheet if not found
                 cols = max(10, len(headers) or 10)
-                worksheet = spreadsheet.add_worksheet(
-                    title=sheet_name, rows="1000", cols=str(cols)
-                )
-                if headers:
-                    worksheet.append_row(headers, value_input_option="USER_ENTERED")
+                try:
+                    worksheet = _with_retry(
+                        spreadsheet.add_worksheet, title=sheet_name, rows="1000", cols=str(cols), retry_on=(429,)
+                    )
+                except gspread.exceptions.APIError as add_error:
+                    # Another session may have created it since the lookup
+                    try:
+                        worksheet = _with_retry(spreadsheet.worksheet, sheet_name)
+                    except gspread.exceptions.WorksheetNotFound:
+                        raise add_error
+                else:
+                    if headers:
+                        _with_retry(worksheet.append_row, headers, value_input_option="USER_ENTERED", retry_on=(429,))
 
-            # Cache the worksheet object for this session
-            self._ws_cache[sheet_name] = worksheet
-            return worksheet
+            # Cache the worksheet object for this session; a handle stored meanwhile by another session wins
+            with self._lock:
+                return self._ws_cache.setdefault(sheet_name, worksheet)
 
         except Exception as e:
             try:
@@ -221,11 +278,41 @@ class SheetsManager:
             return None
 
 
-    def _get_dataframe_cache(self) -> Dict[Tuple[str, Tuple[str, ...]], Tuple[pd.DataFrame, float]]:
-        """Return (and lazily create) the in-memory dataframe cache."""
-        if not hasattr(self, "_df_cache"):
-            self._df_cache = {}
-        return self._df_cache
+    def invalidate_worksheet(self, sheet_name: str):
+        """
+        Drop everything cached about a worksheet: its handle and cached reads.
+        Called after a failed request, since the worksheet may have been deleted or replaced.
+        """
+        with self._lock:
+            getattr(self, "_ws_cache", {}).pop(sheet_name, None)
+            self._drop_cached_reads(sheet_name)
+
+    def _get_dataframe_cache(self) -> Dict[Tuple[str, Tuple[str, ...]], Tuple[pd.DataFrame, float, Optional[str]]]:
+        """Return (and lazily create) the in-memory dataframe cache: frame, monotonic fetch time, spreadsheet modifiedTime."""
+        with self._lock:
+            if not hasattr(self, "_df_cache"):
+                self._df_cache = {}
+            return self._df_cache
+
+    def _drop_cached_reads(self, sheet_name: str):
+        """Remove every cached read of a sheet after it was written."""
+        with self._lock:
+            cache = self._get_dataframe_cache()
+            for cache_key in [key for key in cache if key[0] == sheet_name]:
+                del cache[cache_key]
+
+    def _modified_time(self) -> Optional[str]:
+        """The spreadsheet's Drive modifiedTime, or None if it cannot be fetched (e.g. the Drive API is disabled)."""
+        try:
+            return _with_retry(self.get_spreadsheet().get_lastUpdateTime)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _last_column(worksheet) -> str:
+        """Letter of the worksheet's last grid column."""
+        import gspread
+        return gspread.utils.rowcol_to_a1(1, worksheet.col_count).rstrip("0123456789")
 
     def read_dataframe(
         self,
@@ -249,40 +336,132 @@ class SheetsManager:
             return pd.DataFrame(columns=headers)
         cache_key = (sheet_name, tuple(headers or []))
         cache = self._get_dataframe_cache()
-        now = time.time()
+        now = time.monotonic()
+        modified_time = None
 
-        if not force_refresh and cache_key in cache:
-            cached_df, cached_at = cache[cache_key]
+        entry = None if force_refresh else cache.get(cache_key)
+        if entry is not None:
+            # Shallow copies are enough: with copy-on-write, callers' changes never reach the cached frame
+            cached_df, cached_at, cached_modified = entry
             if ttl_seconds <= 0 or (now - cached_at) < ttl_seconds:
-                return cached_df.copy(deep=True)
-            # Stale entry; remove it before refreshing
-            del cache[cache_key]
+                return cached_df.copy(deep=False)
+            # Expired: one Drive metadata request tells whether the spreadsheet changed at all
+            modified_time = self._modified_time()
+            with self._lock:
+                # Another session may have written the sheet, dropping the entry, meanwhile
+                if cache.get(cache_key) is entry:
+                    if modified_time is not None and modified_time == cached_modified:
+                        cache[cache_key] = (cached_df, now, cached_modified)
+                        return cached_df.copy(deep=False)
+                    # Stale entry; remove it before refreshing
+                    cache.pop(cache_key, None)
 
         try:
             worksheet = self.get_or_create_worksheet(sheet_name, headers)
             if worksheet is None:
                 return pd.DataFrame(columns=headers)
 
-            values = worksheet.get_all_values()
+            values = self._fetch_values(worksheet)
 
             if not values or len(values) <= 1:
                 # Only headers or empty
                 df = pd.DataFrame(columns=headers)
             else:
-                df = pd.DataFrame(values[1:], columns=headers)
-                df = df.dropna(how="all")  # Clean empty rows
+                # Every cell arrives as a string (blanks as ""), so there is no dtype to infer and no
+                # missing value to drop; the typed readers convert the columns they use
+                df = pd.DataFrame(values[1:], columns=headers, dtype=object)
 
-            # Cache the freshly fetched dataframe
-            cache[cache_key] = (df.copy(deep=True), now)
-            return df
+            # Cache the freshly fetched dataframe; modifiedTime was taken before the fetch, so any later change differs
+            cache[cache_key] = (df, now, modified_time)
+            return df.copy(deep=False)
 
         except Exception as e:
+            self.invalidate_worksheet(sheet_name)
             if st and hasattr(st, "error"):
                 st.error(f"Error reading from sheet '{sheet_name}': {str(e)}")
             else:
                 print(f"Error reading from sheet '{sheet_name}': {str(e)}")
             return pd.DataFrame(columns=headers)
     
+    def read_dataframes(self, requests: List[Tuple[str, List[str]]]) -> Dict[str, pd.DataFrame]:
+        """
+        Read several worksheets concurrently, so loading them waits for the slowest read rather than their sum.
+        
+        Args:
+            requests: (sheet_name, headers) pairs
+            
+        Returns:
+            DataFrames keyed by sheet name
+        """
+        # Worker threads need the script context for st.error messages to reach the page
+        ctx = get_script_run_ctx() if get_script_run_ctx else None
+        with ThreadPoolExecutor(
+            max_workers=max(1, len(requests)),
+            initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx) if ctx else None,
+        ) as executor:
+            frames = list(executor.map(lambda request: self.read_dataframe(*request), requests))
+        return {sheet_name: df for (sheet_name, _), df in zip(requests, frames)}
+
+    def _fetch_values(self, worksheet) -> List[List[str]]:
+        """
+        Fetch every row of a worksheet, header included, like get_all_values.
+        Sheets with more rows than CHUNK_ROWS are fetched as row windows in parallel, so a
+        large history is not one giant response and a failed window is retried alone.
+        """
+        total_rows = worksheet.row_count
+        if total_rows <= self.CHUNK_ROWS:
+            return _with_retry(worksheet.get_all_values)
+
+        last_col = self._last_column(worksheet)
+        ranges = [f"A{start}:{last_col}{start + self.CHUNK_ROWS - 1}"
+                  for start in range(1, total_rows + 1, self.CHUNK_ROWS)]
+        # Leave the last window open-ended: rows appended since the worksheet was opened are
+        # not reflected in its cached row count
+        ranges[-1] = ranges[-1].rstrip("0123456789")
+
+        with ThreadPoolExecutor(max_workers=self.CHUNK_WORKERS) as executor:
+            windows = list(executor.map(
+                lambda range_name: _with_retry(worksheet.get_all_values, range_name=range_name), ranges
+            ))
+        # The API leaves out a window's trailing blank rows; pad every window but the last back to its
+        # full height so each row keeps its sheet position, then drop the blank tail as get_all_values does
+        rows = []
+        for window in windows[:-1]:
+            rows.extend(window)
+            rows.extend([] for _ in range(self.CHUNK_ROWS - len(window)))
+        rows.extend(windows[-1])
+        while rows and not any(rows[-1]):
+            rows.pop()
+        # Each window is padded to its own widest row; pad the stitched rows to the widest overall
+        import gspread
+        return gspread.utils.fill_gaps(rows) if rows else []
+
+    def read_key_columns(self, sheet_name: str, headers: List[str], count: int) -> Optional[List[List[str]]]:
+        """
+        Read the data rows of a worksheet's first count columns as text, header row excluded.
+        Used to confirm rows are where a cached read saw them before writing to them by position.
+        Returns None if the sheet cannot be read.
+        """
+        if not self.is_configured():
+            return None
+
+        try:
+            import gspread
+            worksheet = self.get_or_create_worksheet(sheet_name, headers)
+            if worksheet is None:
+                return None
+
+            last_col = gspread.utils.rowcol_to_a1(1, count).rstrip("0123456789")
+            rows = _with_retry(worksheet.get_all_values, range_name=f"A2:{last_col}")
+            while rows and not any(rows[-1]):
+                rows.pop()
+            return [(list(row) + [""] * count)[:count] for row in rows]
+
+        except Exception as e:
+            self.invalidate_worksheet(sheet_name)
+            st.error(f"Error reading from sheet '{sheet_name}': {str(e)}")
+            return None
+
     def write_dataframe(self, sheet_name: str, df: pd.DataFrame, headers: List[str]):
         """
         Write DataFrame to Google Sheet.
@@ -301,22 +480,61 @@ class SheetsManager:
             if worksheet is None:
                 return False
             
-            # Clear existing data (keep headers)
-            worksheet.clear()
-            worksheet.append_row(headers)
-            
-            # Convert DataFrame to list of lists
-            if not df.empty:
-                values = df[headers].values.tolist()
-                if values:
-                    worksheet.append_rows(values)
+            # Headers and data go out as one values update instead of separate append calls
+            rows = [list(headers)] + self._sheet_rows(df, headers)
+
+            # Overwrite in place rather than clearing first, so a failed write never leaves an empty sheet
+            _with_retry(worksheet.update, values=rows, range_name="A1", value_input_option="RAW")
+            # Then clear whatever lies below the new table. Always: rows may have been added by another
+            # process or by hand, so no remembered row count can say the clear is unnecessary
+            _with_retry(worksheet.batch_clear, [f"A{len(rows) + 1}:{self._last_column(worksheet)}"])
+            self._drop_cached_reads(sheet_name)
             
             return True
             
         except Exception as e:
+            self.invalidate_worksheet(sheet_name)
             st.error(f"Error writing to sheet '{sheet_name}': {str(e)}")
             return False
     
+    @staticmethod
+    def _sheet_rows(df: pd.DataFrame, headers: List[str]) -> List[List]:
+        """DataFrame rows as lists of cell values; missing cells are written empty since NaN is not valid JSON."""
+        if df.empty:
+            return []
+        values = df[headers].astype(object)
+        return values.where(values.notna(), "").values.tolist()
+
+    def append_dataframe(self, sheet_name: str, df: pd.DataFrame, headers: List[str]) -> bool:
+        """
+        Append DataFrame rows below the existing data in a single request.
+        
+        Args:
+            sheet_name: Name of the worksheet
+            df: Rows to append
+            headers: Column headers
+        """
+        if not self.is_configured():
+            st.error("Google Sheets not configured. Cannot write data.")
+            return False
+        
+        try:
+            worksheet = self.get_or_create_worksheet(sheet_name, headers)
+            if worksheet is None:
+                return False
+            
+            rows = self._sheet_rows(df, headers)
+            if rows:
+                _with_retry(worksheet.append_rows, rows, value_input_option="RAW", retry_on=(429,))
+            self._drop_cached_reads(sheet_name)
+            
+            return True
+            
+        except Exception as e:
+            self.invalidate_worksheet(sheet_name)
+            st.error(f"Error appending to sheet '{sheet_name}': {str(e)}")
+            return False
+    
     def append_row(self, sheet_name: str, row_data: List, headers: List[str]) -> bool:
         """
         Append a single row to Google Sheet.
@@ -338,10 +556,12 @@ class SheetsManager:
             while len(row_data) < len(headers):
                 row_data.append("")
             
-            worksheet.append_row(row_data[:len(headers)])
+            _with_retry(worksheet.append_row, row_data[:len(headers)], retry_on=(429,))
+            self._drop_cached_reads(sheet_name)
             return True
             
         except Exception as e:
+            self.invalidate_worksheet(sheet_name)
             st.error(f"Error appending row to sheet '{sheet_name}': {str(e)}")
             return False
     
@@ -355,6 +575,17 @@ class SheetsManager:
             row_data: List of values for the row
             headers: Column headers
         """
+        return self.update_rows(sheet_name, [(row_index, row_data)], headers)
+    
+    def update_rows(self, sheet_name: str, updates: List[Tuple[int, List]], headers: List[str]) -> bool:
+        """
+        Update several rows in Google Sheet in one values.batchUpdate request (1-indexed, including header).
+        
+        Args:
+            sheet_name: Name of the worksheet
+            updates: (row_index, row_data) pairs; row 1 is headers
+            headers: Column headers
+        """
         if not self.is_configured():
             return False
         
@@ -363,16 +594,19 @@ class SheetsManager:
             if worksheet is None:
                 return False
             
-            # Ensure row_data matches headers length
-            while len(row_data) < len(headers):
-                row_data.append("")
-            
-            # Update row (row_index is 1-indexed, so row 2 is first data row)
-            worksheet.update(f"A{row_index}", [row_data[:len(headers)]], value_input_option='RAW')
+            # Pad or trim each row to the header width (row_index is 1-indexed, so row 2 is first data row)
+            data = [
+                {"range": f"A{row_index}", "values": [(list(row_data) + [""] * len(headers))[:len(headers)]]}
+                for row_index, row_data in updates
+            ]
+            if data:
+                _with_retry(worksheet.batch_update, data, value_input_option='RAW')
+            self._drop_cached_reads(sheet_name)
             return True
             
         except Exception as e:
-            st.error(f"Error updating row in sheet '{sheet_name}': {str(e)}")
+            self.invalidate_worksheet(sheet_name)
+            st.error(f"Error updating rows in sheet '{sheet_name}': {str(e)}")
             return False
     
     def delete_rows(self, sheet_name: str, row_indices: List[int]) -> bool:
@@ -391,15 +625,38 @@ class SheetsManager:
             if worksheet is None:
                 return False
             
-            # Sort indices descending to avoid index shifting issues
-            sorted_indices = sorted(row_indices, reverse=True)
-            
-            for row_idx in sorted_indices:
-                worksheet.delete_rows(row_idx)
+            # Sort indices descending to avoid index shifting issues, merging adjacent rows into one range
+            ranges = []
+            for row_idx in sorted(set(row_indices), reverse=True):
+                if ranges and ranges[-1][0] == row_idx + 1:
+                    ranges[-1][0] = row_idx
+                else:
+                    ranges.append([row_idx, row_idx + 1])
+
+            # All deletions in one batchUpdate; requests apply in order, so later ones see earlier shifts
+            requests = [
+                {
+                    "deleteDimension": {
+                        "range": {
+                            "sheetId": worksheet.id,
+                            "dimension": "ROWS",
+                            "startIndex": start - 1,
+                            "endIndex": end - 1,
+                        }
+                    }
+                }
+                for start, end in ranges
+            ]
+            if requests:
+                # Not safe to repeat after a server error: the rows below would shift up and be deleted too
+                _with_retry(worksheet.spreadsheet.batch_update, {"requests": requests}, retry_on=(429,))
+                # Cached reads of this sheet still hold the deleted rows
+                self._drop_cached_reads(sheet_name)
             
             return True
             
         except Exception as e:
+            self.invalidate_worksheet(sheet_name)
             st.error(f"Error deleting rows from sheet '{sheet_name}': {str(e)}")
             return False
     
@@ -427,4 +684,8 @@ class SheetsManager:
             return None
 
 
-
+@st.cache_resource
+def get_sheets_manager():
+    """Cached SheetsManager shared by all sessions, so the spreadsheet is opened once per process
+    and its worksheet and read caches are shared."""
+    return SheetsManager()
@@ -0,0 +1,123 @@
+import os
+import re
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sheets_manager import SheetsManager  # noqa: E402
+
+_RANGE_RE = re.compile(r"^[A-Z]+(\d+)(?::[A-Z]+(\d*))?$")
+
+
+def _cell(value):
+    """Render a written value the way the Sheets API reads it back (formatted, as text)."""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _trim(rows):
+    """Drop trailing blank cells from each row and trailing blank rows, like a values response."""
+    rows = [list(row) for row in rows]
+    for row in rows:
+        while row and row[-1] == "":
+            row.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+        self.requests = []
+
+    def batch_update(self, body):
+        self.requests.append(body)
+        for request in body["requests"]:
+            span = request["deleteDimension"]["range"]
+            del self.worksheet.rows[span["startIndex"]:span["endIndex"]]
+
+
+class FakeWorksheet:
+    """In-memory stand-in for a gspread Worksheet, covering the calls SheetsManager makes."""
+
+    id = 0
+    col_count = 26
+
+    def __init__(self, rows, row_count=None):
+        self.rows = [[_cell(value) for value in row] for row in rows]
+        self.grid_rows = row_count or 0
+        self.spreadsheet = FakeSpreadsheet(self)
+        self.calls = []
+
+    @property
+    def row_count(self):
+        return max(self.grid_rows, len(self.rows))
+
+    def _span(self, range_name):
+        start, end = _RANGE_RE.match(range_name).groups()
+        return int(start), int(end) if end else None
+
+    def _write(self, start, values):
+        while len(self.rows) < start - 1 + len(values):
+            self.rows.append([])
+        for offset, row in enumerate(values):
+            self.rows[start - 1 + offset] = [_cell(value) for value in row]
+
+    def get_all_values(self, range_name=None):
+        self.calls.append(("get_all_values", range_name))
+        if range_name is None:
+            rows = self.rows
+        else:
+            start, end = self._span(range_name)
+            rows = self.rows[start - 1:end]
+        rows = _trim(rows)
+        width = max((len(row) for row in rows), default=0)
+        return [row + [""] * (width - len(row)) for row in rows] or [[]]
+
+    def update(self, values, range_name="A1", value_input_option=None):
+        self.calls.append(("update", range_name))
+        self._write(self._span(range_name)[0], values)
+
+    def batch_update(self, data, value_input_option=None):
+        self.calls.append(("batch_update", [entry["range"] for entry in data]))
+        for entry in data:
+            self._write(self._span(entry["range"])[0], entry["values"])
+
+    def batch_clear(self, ranges):
+        self.calls.append(("batch_clear", ranges))
+        for range_name in ranges:
+            start, end = self._span(range_name)
+            for index in range(start - 1, min(end or len(self.rows), len(self.rows))):
+                self.rows[index] = []
+
+    def append_rows(self, rows, value_input_option=None):
+        self.calls.append(("append_rows", len(rows)))
+        self._write(len(_trim(self.rows)) + 1, rows)
+
+    def append_row(self, row, value_input_option=None):
+        self.append_rows([row], value_input_option)
+
+    def values(self):
+        """The sheet's content as get_all_values reports it."""
+        return [row for row in self.get_all_values() if row]
+
+
+def make_sheets_manager(worksheets):
+    """A configured SheetsManager whose worksheet handles are the given fakes; no credentials or network."""
+    manager = SheetsManager.__new__(SheetsManager)
+    manager._lock = threading.RLock()
+    manager.spreadsheet_id = "test"
+    manager.client = object()
+    manager.spreadsheet = object()
+    manager._ws_cache = dict(worksheets)
+    return manager
+
+
+@pytest.fixture
+def sheets_manager_for():
+    return make_sheets_manager
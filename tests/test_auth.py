@@ -0,0 +1,54 @@
+import hashlib
+
+import pytest
+
+from auth import AuthManager, SCRYPT_PREFIX
+
+
+@pytest.fixture
+def auth_manager(tmp_path):
+    """An AuthManager whose password file lives in a temporary directory."""
+    def build():
+        manager = AuthManager.__new__(AuthManager)
+        manager.password_file = str(tmp_path / "data" / "password.txt")
+        manager._initialize_password()
+        manager._stored_hash = None
+        manager._stored_mtime = None
+        return manager
+    return build
+
+
+def _stored(manager):
+    with open(manager.password_file) as f:
+        return f.read()
+
+
+def test_default_password_is_stored_as_salted_scrypt(auth_manager):
+    manager = auth_manager()
+
+    assert _stored(manager).startswith(SCRYPT_PREFIX)
+    assert manager.verify_password("admin123")
+    assert not manager.verify_password("admin1234")
+    assert manager._hash_password("admin123") != manager._hash_password("admin123")
+
+
+def test_legacy_sha256_hash_is_upgraded_on_login(auth_manager):
+    manager = auth_manager()
+    with open(manager.password_file, "w") as f:
+        f.write(hashlib.sha256(b"old-secret").hexdigest())
+
+    assert not manager.verify_password("wrong")
+    assert not _stored(manager).startswith(SCRYPT_PREFIX)
+    assert manager.verify_password("old-secret")
+    assert _stored(manager).startswith(SCRYPT_PREFIX)
+    assert manager.verify_password("old-secret")
+
+
+def test_password_change_reaches_other_sessions(auth_manager):
+    session, other = auth_manager(), auth_manager()
+    assert other.verify_password("admin123")
+
+    assert session.change_password("admin123", "n3w-pass")
+
+    assert not other.verify_password("admin123")
+    assert other.verify_password("n3w-pass")
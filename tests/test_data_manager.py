@@ -0,0 +1,189 @@
+import io
+
+import pandas as pd
+import pytest
+import streamlit as st
+
+import data_manager
+import utils
+from conftest import FakeWorksheet
+from data_manager import DataManager
+
+TRANSACTION_HEADERS = ['id', 'category', 'subcategory', 'transaction_type', 'quantity', 'date', 'supplier', 'notes', 'created_at']
+STOCK_HEADERS = ['category', 'subcategory', 'remaining_qty', 'last_updated', 'supplier']
+TEMPLATE_HEADERS = ['id', 'template_name', 'category', 'subcategory', 'supplier', 'created_at']
+
+
+@pytest.fixture
+def sheets_data_manager(monkeypatch, sheets_manager_for):
+    """Build a DataManager on fake Transactions / Current Stock / Templates worksheets."""
+    def build(stock_rows=(), transaction_rows=()):
+        worksheets = {
+            "Transactions": FakeWorksheet([TRANSACTION_HEADERS, *transaction_rows]),
+            "Current Stock": FakeWorksheet([STOCK_HEADERS, *stock_rows]),
+            "Templates": FakeWorksheet([TEMPLATE_HEADERS]),
+        }
+        manager = sheets_manager_for(worksheets)
+        monkeypatch.setattr(data_manager, "get_sheets_manager", lambda: manager)
+        st.session_state.clear()
+        return DataManager(), worksheets
+    yield build
+    st.session_state.clear()
+
+
+def _stock_keys(worksheet):
+    return [row[:2] for row in worksheet.values()[1:]]
+
+
+def test_delete_subcategory_deletes_only_its_rows(sheets_data_manager):
+    dm, sheets = sheets_data_manager([
+        ["Paper", "A4", 10, "2024-01-01", ""],
+        ["Paper", "A3", 5, "2024-01-01", ""],
+        ["Inks", "Red", 2, "2024-01-01", ""],
+    ])
+
+    assert dm.delete_subcategory("Paper", "A3")[0]
+
+    stock = sheets["Current Stock"]
+    assert len(stock.spreadsheet.requests) == 1
+    assert _stock_keys(stock) == [["Paper", "A4"], ["Inks", "Red"]]
+
+
+def test_delete_subcategory_rewrites_when_sheet_rows_moved(sheets_data_manager):
+    dm, sheets = sheets_data_manager([
+        ["Paper", "A4", 10, "2024-01-01", ""],
+        ["Paper", "A3", 5, "2024-01-01", ""],
+        ["Inks", "Red", 2, "2024-01-01", ""],
+    ])
+    dm.get_current_stock("Paper")
+    # Another session removes the first record; the cached positions are now one row off
+    stock = sheets["Current Stock"]
+    del stock.rows[1]
+
+    assert dm.delete_subcategory("Paper", "A3")[0]
+
+    assert stock.spreadsheet.requests == []
+    assert ["Inks", "Red"] in _stock_keys(stock)
+    assert ["Paper", "A3"] not in _stock_keys(stock)
+
+
+def test_delete_transactions_rewrites_when_ids_differ(sheets_data_manager):
+    dm, sheets = sheets_data_manager(
+        [["Paper", "A4", 10, "2024-01-01", ""]],
+        [
+            [1, "Paper", "A4", "Stock In", 10, "2024-01-01", "", "", ""],
+            [2, "Paper", "A3", "Stock In", 5, "2024-01-01", "", "", ""],
+            [3, "Inks", "Red", "Stock In", 2, "2024-01-01", "", "", ""],
+        ],
+    )
+    dm._read_transactions()
+    transactions = sheets["Transactions"]
+    # Someone reorders the sheet by hand; the cached position of id 2 now holds id 3
+    transactions.rows[1:] = transactions.rows[2:] + transactions.rows[1:2]
+
+    assert dm.delete_subcategory("Paper", "A3", delete_transactions=True)[0]
+
+    assert transactions.spreadsheet.requests == []
+    assert sorted(row[0] for row in transactions.values()[1:]) == ["1", "3"]
+
+
+def test_stock_in_updates_its_row_in_place(sheets_data_manager):
+    dm, sheets = sheets_data_manager([
+        ["Paper", "A4", 10, "2024-01-01", ""],
+        ["Paper", "A3", 5, "2024-01-01", ""],
+    ])
+
+    assert dm.add_transaction("Paper", "A3", "Stock In", 2, "2024-01-02")
+
+    stock = sheets["Current Stock"]
+    assert ("batch_update", ["A3"]) in stock.calls
+    assert [row[:3] for row in stock.values()[1:]] == [["Paper", "A4", "10"], ["Paper", "A3", "7"]]
+
+
+def test_stock_update_rewrites_when_sheet_rows_moved(sheets_data_manager):
+    dm, sheets = sheets_data_manager([
+        ["Paper", "A4", 10, "2024-01-01", ""],
+        ["Paper", "A3", 5, "2024-01-01", ""],
+        ["Inks", "Red", 2, "2024-01-01", ""],
+    ])
+    dm.get_current_stock("Paper")
+    # Another session removes the first record; A3's cached row now holds Inks / Red
+    stock = sheets["Current Stock"]
+    del stock.rows[1]
+
+    assert dm.add_transaction("Paper", "A3", "Stock In", 2, "2024-01-02")
+
+    assert not any(call[0] == "batch_update" for call in stock.calls)
+    rows = {tuple(row[:2]): row[2] for row in stock.values()[1:]}
+    assert rows[("Paper", "A3")] == "7" and rows[("Inks", "Red")] == "2"
+
+
+def test_duplicate_stock_rows_update_in_one_batch(sheets_data_manager):
+    dm, sheets = sheets_data_manager([
+        ["Paper", "A3", 5, "2024-01-01", ""],
+        ["Paper", "A4", 10, "2024-01-01", ""],
+        ["Paper", "A3", 5, "2024-01-01", ""],
+    ])
+
+    assert dm.add_transaction("Paper", "A3", "Stock Out", 1, "2024-01-02")
+
+    stock = sheets["Current Stock"]
+    assert [call for call in stock.calls if call[0] == "batch_update"] == [("batch_update", ["A2", "A4"])]
+    assert [row[2] for row in stock.values()[1:]] == ["4", "10", "4"]
+
+
+def test_duplicate_stock_rows_rewrite_when_sheet_rows_moved(sheets_data_manager):
+    dm, sheets = sheets_data_manager([
+        ["Paper", "A3", 5, "2024-01-01", ""],
+        ["Paper", "A4", 10, "2024-01-01", ""],
+        ["Paper", "A3", 5, "2024-01-01", ""],
+    ])
+    dm.get_current_stock("Paper")
+    # Someone reorders the sheet by hand; the first cached A3 row now holds A4
+    stock = sheets["Current Stock"]
+    stock.rows[1], stock.rows[2] = stock.rows[2], stock.rows[1]
+
+    assert dm.add_transaction("Paper", "A3", "Stock Out", 1, "2024-01-02")
+
+    assert not any(call[0] == "batch_update" for call in stock.calls)
+    assert [row[:3] for row in stock.values()[1:]] == [
+        ["Paper", "A3", "4"], ["Paper", "A4", "10"], ["Paper", "A3", "4"],
+    ]
+
+
+@pytest.mark.parametrize("calamine", [True, False])
+def test_bulk_upload_reads_every_chunk(sheets_data_manager, monkeypatch, calamine):
+    if calamine and not utils.CALAMINE_AVAILABLE:
+        pytest.skip("python-calamine not installed")
+    monkeypatch.setattr(utils, "CALAMINE_AVAILABLE", calamine)
+    warnings = []
+    monkeypatch.setattr(st, "warning", warnings.append)
+    workbook = io.BytesIO()
+    pd.DataFrame({
+        "Subcategory": ["A4", "A4", "A3", "A3", "A5"],
+        "Type": ["Stock In", "Stock In", "Stock In", "Stock Out", "Stock In"],
+        "Qty": [10, 5, 7, "many", 3],
+        "Date": ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"],
+    }).to_excel(workbook, index=False)
+    workbook.seek(0)
+    dm, sheets = sheets_data_manager()
+
+    assert dm.bulk_upload("Paper", utils.iter_excel_upload_chunks(workbook, chunk_size=2)) == 4
+
+    assert [row[0] for row in sheets["Transactions"].values()[1:]] == ["1", "2", "3", "4"]
+    # Row numbers in messages count from the top of the sheet, not the chunk
+    assert warnings == ["Skipped 1 row(s) with an invalid date or quantity: 4"]
+    stock = {tuple(row[:2]): row[2] for row in sheets["Current Stock"].values()[1:]}
+    assert stock == {("Paper", "A4"): "15", ("Paper", "A3"): "7", ("Paper", "A5"): "3"}
+
+
+def test_template_lookup_sees_templates_saved_by_another_session(sheets_data_manager):
+    dm, _ = sheets_data_manager()
+    other = DataManager()
+    assert dm.get_template_by_name("Paper", "Weekly") is None
+
+    assert other.save_template("Weekly", "Paper", "A4")
+    assert dm.get_template_by_name("Paper", "Weekly")["subcategory"] == "A4"
+
+    assert other.delete_template("Paper", "Weekly")
+    assert dm.get_template_by_name("Paper", "Weekly") is None
@@ -0,0 +1,103 @@
+import threading
+
+import gspread
+import pandas as pd
+
+from conftest import FakeWorksheet
+
+HEADERS = ["id", "name"]
+
+
+def test_fetch_values_keeps_blank_rows_at_window_edges(sheets_manager_for):
+    rows = [HEADERS, [1, "a"], [], [], [2, "b"], [], [3, "c"], [], []]
+    worksheet = FakeWorksheet(rows, row_count=20)
+    manager = sheets_manager_for({"Sheet": worksheet})
+    manager.CHUNK_ROWS = 3
+
+    values = manager._fetch_values(worksheet)
+
+    assert len([call for call in worksheet.calls if call[1]]) == 7
+    assert values == worksheet.get_all_values()
+    assert values[4] == ["2", "b"] and values[6] == ["3", "c"]
+
+
+def test_fetch_values_matches_single_read_when_window_ends_blank(sheets_manager_for):
+    rows = [HEADERS, [1, "a"], [2, "b"], []]
+    worksheet = FakeWorksheet(rows, row_count=10)
+    manager = sheets_manager_for({"Sheet": worksheet})
+    manager.CHUNK_ROWS = 4
+
+    assert manager._fetch_values(worksheet) == worksheet.get_all_values()
+
+
+def test_write_dataframe_clears_rows_added_since_last_read(sheets_manager_for):
+    worksheet = FakeWorksheet([HEADERS, [1, "a"], [2, "b"]])
+    manager = sheets_manager_for({"Sheet": worksheet})
+    manager.read_dataframe("Sheet", HEADERS)
+    # Rows appended by another process, unseen by this manager
+    worksheet.rows += [["3", "c"], ["4", "d"]]
+
+    assert manager.write_dataframe("Sheet", pd.DataFrame({"id": [1], "name": ["a"]}), HEADERS)
+
+    assert worksheet.values() == [HEADERS, ["1", "a"]]
+    assert manager.read_dataframe("Sheet", HEADERS).to_dict("records") == [{"id": "1", "name": "a"}]
+
+
+class _Response:
+    status_code = 400
+    headers = {}
+    text = "already exists"
+
+    def json(self):
+        return {"error": {"code": 400, "message": self.text, "status": "INVALID_ARGUMENT"}}
+
+
+class _Spreadsheet:
+    """Spreadsheet stand-in whose lookups can be held open and whose sheets appear concurrently."""
+
+    def __init__(self, existing=None, release=None):
+        self.existing = existing or {}
+        self.release = release
+        self.lookups = 0
+
+    def worksheet(self, title):
+        self.lookups += 1
+        if self.release is not None:
+            assert self.release.wait(5)
+        if title in self.existing:
+            return self.existing[title]
+        raise gspread.exceptions.WorksheetNotFound(title)
+
+    def add_worksheet(self, title, rows, cols):
+        # Another session created the sheet between our lookup and this request
+        self.existing[title] = FakeWorksheet([HEADERS])
+        raise gspread.exceptions.APIError(_Response())
+
+
+def test_worksheet_lookup_runs_outside_the_lock(sheets_manager_for):
+    cached = FakeWorksheet([HEADERS])
+    manager = sheets_manager_for({"Cached": cached})
+    release = threading.Event()
+    manager.spreadsheet = _Spreadsheet(release=release)
+    slow = threading.Thread(target=manager.get_or_create_worksheet, args=("Other", HEADERS))
+    slow.start()
+    try:
+        results = []
+        fast = threading.Thread(target=lambda: results.append(manager.get_or_create_worksheet("Cached", HEADERS)))
+        fast.start()
+        fast.join(2)
+        assert results == [cached]
+    finally:
+        release.set()
+        slow.join()
+
+
+def test_worksheet_created_concurrently_is_looked_up_again(sheets_manager_for):
+    manager = sheets_manager_for({})
+    spreadsheet = _Spreadsheet()
+    manager.spreadsheet = spreadsheet
+
+    worksheet = manager.get_or_create_worksheet("New", HEADERS)
+
+    assert worksheet is spreadsheet.existing["New"]
+    assert spreadsheet.lookups == 2
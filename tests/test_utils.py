@@ -0,0 +1,84 @@
+import io
+
+import pandas as pd
+import pytest
+
+import utils
+
+needs_calamine = pytest.mark.skipif(not utils.CALAMINE_AVAILABLE, reason="python-calamine not installed")
+
+
+def _workbook(rows=25):
+    buffer = io.BytesIO()
+    pd.DataFrame({
+        "subcategory": [f"{i}x20" for i in range(rows)],
+        "quantity": [i + 0.5 for i in range(rows)],
+        "date": pd.date_range("2024-01-01", periods=rows),
+    }).to_excel(buffer, index=False)
+    buffer.seek(0)
+    return buffer
+
+
+@needs_calamine
+def test_upload_preview_and_processing_both_use_calamine(monkeypatch):
+    engines = []
+    read_excel = pd.read_excel
+
+    def spy(*args, **kwargs):
+        engines.append(kwargs.get("engine"))
+        return read_excel(*args, **kwargs)
+
+    monkeypatch.setattr(pd, "read_excel", spy)
+    workbook = _workbook()
+
+    utils.read_excel_upload(workbook, nrows=5)
+    workbook.seek(0)
+    list(utils.iter_excel_upload_chunks(workbook, chunk_size=10))
+
+    assert engines == ["calamine", "calamine"]
+
+
+@needs_calamine
+def test_calamine_and_openpyxl_chunks_agree(monkeypatch):
+    workbook = _workbook()
+    fast = list(utils.iter_excel_upload_chunks(workbook, chunk_size=10))
+    monkeypatch.setattr(utils, "CALAMINE_AVAILABLE", False)
+    workbook.seek(0)
+    streamed = list(utils.iter_excel_upload_chunks(workbook, chunk_size=10))
+
+    assert [len(chunk) for chunk in fast] == [len(chunk) for chunk in streamed] == [10, 10, 5]
+    pd.testing.assert_frame_equal(pd.concat(fast), pd.concat(streamed))
+
+
+def _report_frame():
+    return pd.DataFrame({
+        "category": ["Paper", "Inks", None],
+        "quantity": [10.0, 2.5, float("nan")],
+        "date": pd.to_datetime(["2024-01-01", "2024-02-15", None]),
+    })
+
+
+def test_dataframe_to_csv_matches_pandas_output():
+    df = _report_frame()
+
+    parsed = pd.read_csv(io.BytesIO(utils.dataframe_to_csv(df)))
+    expected = pd.read_csv(io.BytesIO(df.to_csv(index=False).encode("utf-8")))
+
+    pd.testing.assert_frame_equal(parsed, expected)
+    assert parsed["date"].tolist()[:2] == ["2024-01-01", "2024-02-15"]
+
+
+@pytest.mark.parametrize("pyexcelerate", [True, False])
+def test_dataframe_to_excel_round_trips(monkeypatch, pyexcelerate):
+    if pyexcelerate and not utils.PYEXCELERATE_AVAILABLE:
+        pytest.skip("pyexcelerate not installed")
+    monkeypatch.setattr(utils, "PYEXCELERATE_AVAILABLE", pyexcelerate)
+    df = _report_frame()
+
+    workbook = utils.dataframe_to_excel(df, sheet_name="Report")
+    read_back = pd.read_excel(workbook, sheet_name="Report", engine="openpyxl")
+
+    # Missing values are written as empty cells, so the all-blank last row is not read back
+    expected = df.iloc[:2].copy()
+    expected["date"] = expected["date"].astype(read_back["date"].dtype)
+    pd.testing.assert_frame_equal(read_back, expected)
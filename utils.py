@@ -1,6 +1,17 @@
 from datetime import datetime, date
+from io import BytesIO
+import importlib.util
+import itertools
+import re
 import pandas as pd
 
+# Optional Excel engines are only looked up here; they are imported on first use
+CALAMINE_AVAILABLE = importlib.util.find_spec("python_calamine") is not None
+PYEXCELERATE_AVAILABLE = importlib.util.find_spec("pyexcelerate") is not None
+
+# "15x20", "15 X 20", "15*20" and "15×20" all describe the same sheet size
+SIZE_RE = re.compile(r"(\d+(?:\.\d+)?)\s*[xX×*]\s*(\d+(?:\.\d+)?)")
+
 def format_date(date_input):
     """Format date input to string."""
     if isinstance(date_input, (datetime, date)):
@@ -42,6 +53,10 @@ def validate_excel_columns(df, required_columns):
     missing_columns = [col for col in required_columns if col not in df.columns]
     return len(missing_columns) == 0, missing_columns
 
+def normalize_name(value):
+    """Collapse surrounding and repeated whitespace in a category or subcategory name."""
+    return " ".join(str(value).split())
+
 def clean_string_input(input_str):
     """Clean and validate string input."""
     if pd.isna(input_str):
@@ -91,5 +106,135 @@ def get_low_stock_items(stock_df, threshold=10):
         stock_df['remaining_qty'] = pd.to_numeric(stock_df['remaining_qty'], errors='coerce').fillna(0)
     
     return stock_df[stock_df['remaining_qty'] <= threshold]
-    
-    
+
+def parse_date_column(values, fmt='%Y-%m-%d'):
+    """Parse a Series of stored date strings with an explicit format; values in other legacy formats fall back to inference."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    dates = pd.to_datetime(values, errors='coerce', format=fmt, cache=True)
+    retry = dates.isna() & values.notna() & (values.astype(str).str.strip() != '')
+    if retry.any():
+        dates[retry] = pd.to_datetime(values[retry].astype(str), errors='coerce', format='mixed')
+    return dates
+
+def parse_size_columns(size_texts):
+    """Parse a Series of size strings into (width, height) float Series; unparsable rows are NaN."""
+    sizes = size_texts.astype(str).str.extract(SIZE_RE.pattern, expand=True).astype(float)
+    return sizes[0], sizes[1]
+
+# Common header variants accepted for bulk upload columns
+UPLOAD_COLUMN_ALIASES = {
+    'qty': 'quantity',
+    'sub': 'subcategory',
+    'sub category': 'subcategory',
+    'sub_category': 'subcategory',
+    'type': 'transaction_type',
+    'transaction type': 'transaction_type',
+    'date received': 'date',
+    'transaction date': 'date',
+    'transaction_date': 'date',
+    'vendor': 'supplier',
+    'note': 'notes',
+    'remarks': 'notes',
+}
+
+def normalize_upload_columns(columns):
+    """Strip and lowercase upload headers, mapping known aliases unless the real column is also present."""
+    normalized = pd.Index(columns).astype(str).str.strip().str.lower()
+    present = set(normalized)
+    return pd.Index([
+        UPLOAD_COLUMN_ALIASES[name]
+        if name in UPLOAD_COLUMN_ALIASES and UPLOAD_COLUMN_ALIASES[name] not in present
+        else name
+        for name in normalized
+    ])
+
+def iter_excel_upload_chunks(uploaded_file, chunk_size=10000):
+    """Yield the first sheet of an uploaded workbook as DataFrames of at most chunk_size rows.
+    With calamine installed the sheet is parsed in one fast pass and yielded in slices; otherwise
+    cells are streamed from openpyxl in read-only mode, so memory follows the chunk size."""
+    if CALAMINE_AVAILABLE:
+        df = pd.read_excel(uploaded_file, engine='calamine')
+        # Slices keep the default index, so row numbers in messages stay global across chunks
+        for start in range(0, max(len(df), 1), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+        return
+    yield from _iter_openpyxl_chunks(uploaded_file, chunk_size)
+
+def _iter_openpyxl_chunks(uploaded_file, chunk_size):
+    """iter_excel_upload_chunks without calamine: stream rows from openpyxl in read-only mode."""
+    import openpyxl
+    workbook = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+        start = 0
+        while True:
+            batch = list(itertools.islice(rows, chunk_size))
+            if batch or not start:
+                # Index by sheet position so row numbers in messages stay global across chunks
+                yield pd.DataFrame(batch, columns=columns, index=range(start, start + len(batch)))
+            if len(batch) < chunk_size:
+                break
+            start += len(batch)
+    finally:
+        workbook.close()
+
+def read_excel_upload(uploaded_file, nrows=None):
+    """Read the first sheet (or its first nrows rows) of an uploaded workbook, using calamine when installed."""
+    if CALAMINE_AVAILABLE:
+        return pd.read_excel(uploaded_file, engine='calamine', nrows=nrows)
+
+    chunks = _iter_openpyxl_chunks(uploaded_file, chunk_size=nrows or 10000)
+    try:
+        frames = [next(chunks)] if nrows else list(chunks)
+    except StopIteration:
+        frames = []
+    finally:
+        chunks.close()
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames)
+    # Read-only sheets can report trailing blank rows; read_excel stops at the last row with values
+    last_row = df.last_valid_index()
+    return df.iloc[:0] if last_row is None else df.loc[:last_row]
+
+def dataframe_to_excel(df, sheet_name='Sheet1'):
+    """Write a DataFrame to an in-memory .xlsx file, using PyExcelerate's fast writer when installed."""
+    buffer = BytesIO()
+    if PYEXCELERATE_AVAILABLE:
+        from pyexcelerate import Workbook as ExcelerateWorkbook, Style, Format
+        # Plain Python values only; missing cells stay empty
+        values = df.astype(object).where(df.notna(), None).values.tolist()
+        workbook = ExcelerateWorkbook()
+        sheet = workbook.new_sheet(sheet_name, data=[[str(col) for col in df.columns]] + values)
+        # Dates are stored as serial numbers and need a number format to display as dates
+        for i, dtype in enumerate(df.dtypes, start=1):
+            if pd.api.types.is_datetime64_any_dtype(dtype):
+                sheet.set_col_style(i, Style(format=Format('yyyy-mm-dd')))
+        workbook.save(buffer)
+    else:
+        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            df.to_excel(writer, index=False, sheet_name=sheet_name)
+    buffer.seek(0)
+    return buffer
+
+def dataframe_to_csv(df):
+    """Encode a DataFrame as UTF-8 CSV bytes with PyArrow's writer, falling back to pandas."""
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+    except ImportError:
+        return df.to_csv(index=False).encode('utf-8')
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Dates are whole days; write them as YYYY-MM-DD like to_csv does, not full timestamps
+    for i, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.date32(), safe=False))
+    buffer = BytesIO()
+    pa_csv.write_csv(table, buffer)
+    return buffer.getvalue()